@@ -0,0 +1,223 @@
+"""
+Benchmarks for the DataManager hot paths on synthetic data.
+
+Generates calendars of increasing size (days x bookings per day x spaces) and
+inquiry journals, then reports latency percentiles and peak memory for each
+operation. Results can be saved as a baseline and compared against later:
+
+    python benchmarks/bench_data_manager.py --save-baseline
+    python benchmarks/bench_data_manager.py --compare
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from calendar_index import WORK_START, WORK_END, to_time_str  # noqa: E402
+from data_manager import DataManager  # noqa: E402
+from storage import JsonStorage, PartitionedStorage, SqliteStorage  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# (days, bookings per day, spaces)
+PRESETS = {
+    "quick": [(30, 4, 2), (365, 16, 2)],
+    "full": [(30, 4, 2), (365, 16, 2), (1095, 64, 2), (3650, 64, 4)],
+}
+INQUIRY_PRESETS = {
+    "quick": [10_000, 100_000],
+    "full": [10_000, 100_000, 1_000_000],
+}
+
+SPACES = ["dvorana", "sala_za_sastanke", "prostor_3", "prostor_4"]
+FIRST_DATE = datetime.now().date() + timedelta(days=1)
+
+
+def synthetic_calendar(days: int, bookings_per_day: int, spaces: int) -> dict:
+    """Evenly spread, non-overlapping bookings for every space and day."""
+    step = (WORK_END - WORK_START) // bookings_per_day
+    day_bookings = [
+        (to_time_str(WORK_START + i * step), to_time_str(WORK_START + i * step + step // 2))
+        for i in range(bookings_per_day)
+    ]
+    dates = [(FIRST_DATE + timedelta(days=offset)).isoformat() for offset in range(days)]
+    return {space: {date: list(day_bookings) for date in dates} for space in SPACES[:spaces]}
+
+
+def write_journal(path: Path, count: int):
+    """Write `count` synthetic inquiries to a JSONL journal."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "timestamp": datetime.now().isoformat(),
+                "name": f"Korisnik {i}",
+                "contact_type": "email",
+                "contact_value": f"korisnik{i}@example.com",
+                "space_type": "dvorana",
+                "requirements": {"participants": 20, "date": "2030-01-01", "time": "10:00-12:00"},
+            }, ensure_ascii=False) + "\n")
+
+
+def measure(operation, repeat: int) -> dict:
+    """Run `operation` `repeat` times; return latency percentiles (ms) and peak memory (KiB)."""
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        operation(i)
+        latencies.append((time.perf_counter_ns() - start) / 1e6)
+
+    # Memory is traced in a separate call, tracemalloc would distort the timings
+    tracemalloc.start()
+    operation(0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if len(latencies) > 1:
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return {
+        "p50_ms": round(p50, 4),
+        "p95_ms": round(p95, 4),
+        "p99_ms": round(p99, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_calendar(workdir: Path, backend: str, days: int, bookings_per_day: int, spaces: int, repeat: int) -> dict:
+    calendar = synthetic_calendar(days, bookings_per_day, spaces)
+    calendar_path = workdir / "calendar.json"
+    journal_path = workdir / "inquiries.jsonl"
+
+    if backend == "sqlite":
+        db_path = workdir / "bench.db"
+        SqliteStorage(db_path).set_days(
+            (space, date, bookings) for space, dates in calendar.items() for date, bookings in dates.items()
+        )
+        make_storage = lambda: SqliteStorage(db_path)  # noqa: E731
+    elif backend == "partitioned":
+        with open(calendar_path, "w", encoding="utf-8") as f:
+            json.dump(calendar, f)
+        PartitionedStorage(workdir / "calendar", journal_path, legacy_calendar_path=calendar_path)
+        make_storage = lambda: PartitionedStorage(workdir / "calendar", journal_path)  # noqa: E731
+    else:
+        with open(calendar_path, "w", encoding="utf-8") as f:
+            json.dump(calendar, f)
+        make_storage = lambda: JsonStorage(journal_path, calendar_path)  # noqa: E731
+
+    manager = DataManager(storage=make_storage())
+    rng = random.Random(42)
+    dates = [(FIRST_DATE + timedelta(days=rng.randrange(days))).isoformat() for _ in range(repeat)]
+    starts = [WORK_START + 15 * rng.randrange((WORK_END - WORK_START) // 15 - 4) for _ in range(repeat)]
+
+    results = {
+        "load": measure(lambda i: make_storage(), max(3, repeat // 50)),
+        "check_availability": measure(
+            lambda i: manager.check_availability("dvorana", dates[i], to_time_str(starts[i]), to_time_str(starts[i] + 60)),
+            repeat,
+        ),
+        "get_available_slots": measure(lambda i: manager.get_available_slots("dvorana", dates[i]), repeat),
+        "find_free_windows_7d": measure(
+            lambda i: manager.find_free_windows("svi", dates[i], 7, 120), max(10, repeat // 10)
+        ),
+        "find_earliest_slots": measure(lambda i: manager.find_earliest_slots("svi", dates[i], 180), repeat),
+        "save_one_day": measure(
+            lambda i: manager._storage.set_days([("dvorana", dates[i], calendar["dvorana"][dates[i]])]),
+            max(3, repeat // 50),
+        ),
+    }
+    return results
+
+
+def bench_inquiries(workdir: Path, backend: str, count: int, repeat: int) -> dict:
+    journal_path = workdir / "inquiries.jsonl"
+    if backend == "sqlite":
+        storage = SqliteStorage(workdir / "inquiries.db")
+        with storage._write_transaction() as connection:
+            connection.executemany(
+                "INSERT INTO inquiries (timestamp, data) VALUES (?, ?)",
+                ((datetime.now().isoformat(), json.dumps({"name": f"Korisnik {i}"})) for i in range(count)),
+            )
+    else:
+        write_journal(journal_path, count)
+        storage = JsonStorage(journal_path, workdir / "calendar.json")
+
+    manager = DataManager(storage=storage)
+    return {
+        "collect_contact": measure(
+            lambda i: manager.collect_contact(
+                f"Novi {i}", "email", f"novi{i}@example.com", "dvorana", {"participants": 5}
+            ),
+            repeat,
+        ),
+        "iter_inquiries": measure(lambda i: sum(1 for _ in manager.iter_inquiries()), 3),
+    }
+
+
+def run(preset: str, backend: str, repeat: int) -> dict:
+    results = {}
+    for days, bookings_per_day, spaces in PRESETS[preset]:
+        with tempfile.TemporaryDirectory() as workdir:
+            label = f"{days}d x {bookings_per_day}b x {spaces}s"
+            print(f"calendar {label} ...", file=sys.stderr)
+            for operation, stats in bench_calendar(Path(workdir), backend, days, bookings_per_day, spaces, repeat).items():
+                results[f"{operation} [{label}]"] = stats
+    for count in INQUIRY_PRESETS[preset]:
+        with tempfile.TemporaryDirectory() as workdir:
+            label = f"{count} inquiries"
+            print(f"{label} ...", file=sys.stderr)
+            for operation, stats in bench_inquiries(Path(workdir), backend, count, repeat).items():
+                results[f"{operation} [{label}]"] = stats
+    return results
+
+
+def print_results(results: dict, baseline: dict = None):
+    header = f"{'operation':<52} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10}"
+    if baseline is not None:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        line = (
+            f"{name:<52} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+            f"{stats['p99_ms']:>9.3f} {stats['peak_kib']:>10.1f}"
+        )
+        if baseline is not None:
+            base = baseline.get(name)
+            if base and base["p50_ms"] > 0:
+                ratio = stats["p50_ms"] / base["p50_ms"]
+                flag = "  SLOWER" if ratio > 1.25 else "  faster" if ratio < 0.8 else ""
+                line += f" {ratio:>11.2f}x{flag}"
+            else:
+                line += f" {'n/a':>12}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DataManager hot paths")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--backend", choices=["json", "sqlite", "partitioned"], default="json")
+    parser.add_argument("--repeat", type=int, default=500, help="Calls per operation")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {BASELINE_PATH.name}")
+    parser.add_argument("--compare", action="store_true", help=f"Compare against {BASELINE_PATH.name}")
+    args = parser.parse_args()
+
+    results = run(args.preset, args.backend, args.repeat)
+    key = f"{args.backend}/{args.preset}"
+
+    baseline_file = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    print_results(results, baseline_file.get(key, {}) if args.compare else None)
+
+    if args.save_baseline:
+        baseline_file[key] = results
+        BASELINE_PATH.write_text(json.dumps(baseline_file, indent=2) + "\n")
+        print(f"\nBaseline saved to {BASELINE_PATH} ({key})")
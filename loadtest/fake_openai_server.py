@@ -0,0 +1,233 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions (streamed or not) with scripted behaviour
+good enough to drive the conversation engine: user messages that mention a
+date ask for availability tools, contact details trigger collect_contact, and
+tool results are answered with a short Croatian summary. Latency is
+configurable so the load test can model a slow model.
+
+    python loadtest/fake_openai_server.py --port 8765 --first-token-ms 400
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+TIME_RANGE_PATTERN = re.compile(r"(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+
+
+def plan_response(messages: list) -> dict:
+    """Decide what the fake model answers: {"content": str} or {"tool_calls": [...]}."""
+    last = messages[-1]
+    if last["role"] == "tool":
+        results = [m["content"] for m in messages if m["role"] == "tool"][-3:]
+        return {"content": "Provjerio sam: " + " ".join(results) + " Želite li rezervirati neki od termina?"}
+
+    text = last.get("content") or ""
+    lowered = text.lower()
+    date = DATE_PATTERN.search(text)
+    space_type = "sala_za_sastanke" if "sal" in lowered else "dvorana"
+
+    if EMAIL_PATTERN.search(text):
+        arguments = {
+            "name": "Test Korisnik",
+            "contact_type": "email",
+            "contact_value": EMAIL_PATTERN.search(text).group(0),
+            "space_type": "konferencijska_dvorana" if space_type == "dvorana" else space_type,
+            "requirements": {
+                "participants": 20,
+                "date": date.group(0) if date else "",
+                "time": "",
+                "additional_services": [],
+                "duration": "",
+                "tour_requested": False,
+            },
+        }
+        return {"tool_calls": [("collect_contact", arguments)]}
+
+    if date and "najranij" in lowered:
+        return {"tool_calls": [("find_earliest_slots", {
+            "space_type": "svi", "start_date": date.group(0), "duration_minutes": 120,
+            "count": 3, "from_time": "08:00", "to_time": "22:00",
+        })]}
+
+    if date and "tjed" in lowered:
+        return {"tool_calls": [("find_free_windows", {
+            "space_type": "svi", "start_date": date.group(0), "days": 7,
+            "duration_minutes": 180, "from_time": "08:00", "to_time": "22:00",
+        })]}
+
+    if date and TIME_RANGE_PATTERN.search(text):
+        start, end = TIME_RANGE_PATTERN.search(text).groups()
+        return {"tool_calls": [("check_availability", {
+            "space_type": space_type, "date": date.group(0),
+            "start_time": start.zfill(5), "end_time": end.zfill(5),
+        })]}
+
+    if date:
+        # Ask about both bookable spaces at once, like the real model often does
+        return {"tool_calls": [
+            ("get_available_slots", {"space_type": "dvorana", "date": date.group(0)}),
+            ("get_available_slots", {"space_type": "sala_za_sastanke", "date": date.group(0)}),
+        ]}
+
+    return {"content": "Rado ću pomoći. Koji prostor vas zanima i za koji datum i vrijeme?"}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep the load test output readable
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        server = self.server
+        with server.stats_lock:
+            server.requests += 1
+        if server.error_rate and (server.requests % round(1 / server.error_rate) == 0):
+            self._send_json(500, {"error": {"message": "Simulated server error"}})
+            return
+
+        plan = plan_response(request["messages"])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        prompt_tokens = sum(len(m.get("content") or "") for m in request["messages"]) // 4
+
+        time.sleep(server.first_token_ms / 1000)
+        if request.get("stream"):
+            self._stream(request, plan, completion_id, prompt_tokens)
+        else:
+            self._complete(request, plan, completion_id, prompt_tokens)
+
+    def _tool_calls(self, plan: dict) -> list:
+        return [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+            }
+            for name, arguments in plan.get("tool_calls", [])
+        ]
+
+    def _complete(self, request: dict, plan: dict, completion_id: str, prompt_tokens: int):
+        content = plan.get("content")
+        if content:
+            time.sleep(self.server.token_delay_ms * len(content.split()) / 1000)
+        message = {"role": "assistant", "content": content}
+        tool_calls = self._tool_calls(plan)
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+        })
+
+    def _stream(self, request: dict, plan: dict, completion_id: str, prompt_tokens: int):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason=None, usage=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o"),
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage:
+                payload["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        if plan.get("content"):
+            for word in re.findall(r"\S+\s*", plan["content"]):
+                chunk({"content": word})
+                time.sleep(self.server.token_delay_ms / 1000)
+            finish_reason = "stop"
+        else:
+            for index, tool_call in enumerate(self._tool_calls(plan)):
+                arguments = tool_call["function"]["arguments"]
+                half = len(arguments) // 2
+                chunk({"tool_calls": [{
+                    "index": index, "id": tool_call["id"], "type": "function",
+                    "function": {"name": tool_call["function"]["name"], "arguments": arguments[:half]},
+                }]})
+                time.sleep(self.server.token_delay_ms / 1000)
+                chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[half:]}}]})
+            finish_reason = "tool_calls"
+        chunk({}, finish_reason=finish_reason)
+
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk({}, usage={"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded fake API server; use `base_url` as the OpenAI client's base URL."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_ms: float = 300,
+                 token_delay_ms: float = 20, error_rate: float = 0.0):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.first_token_ms = first_token_ms
+        self.token_delay_ms = token_delay_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-delay-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=args.port, first_token_ms=args.first_token_ms,
+                              token_delay_ms=args.token_delay_ms, error_rate=args.error_rate)
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,157 @@
+"""
+Offline load test for the conversation engine.
+
+Replays the scripted Croatian conversations in conversations.json with N
+concurrent sessions against the fake OpenAI server (started in-process unless
+--base-url is given) and reports throughput and a per-turn latency breakdown.
+
+    python loadtest/run_loadtest.py --sessions 20 --first-token-ms 400
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from data_manager import DataManager  # noqa: E402
+from engine import ConversationEngine  # noqa: E402
+from faq import FaqMatcher  # noqa: E402
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from openai_client import create_client  # noqa: E402
+from storage import JsonStorage  # noqa: E402
+from utils import get_available_tools, prepare_prompt  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+CONVERSATIONS_PATH = Path(__file__).with_name("conversations.json")
+DATE_PLACEHOLDER = re.compile(r"\{date\+(\d+)\}")
+
+
+def load_conversations() -> list:
+    """Read the scripts and fill in {date+N} placeholders relative to today."""
+    today = datetime.now().date()
+    conversations = json.loads(CONVERSATIONS_PATH.read_text(encoding="utf-8"))
+    return [
+        [
+            DATE_PLACEHOLDER.sub(lambda m: (today + timedelta(days=int(m.group(1)))).isoformat(), prompt)
+            for prompt in conversation
+        ]
+        for conversation in conversations
+    ]
+
+
+def percentiles(values: list) -> str:
+    if not values:
+        return "n/a"
+    if len(values) == 1:
+        return f"p50 {values[0]:8.1f}  p95 {values[0]:8.1f}  max {values[0]:8.1f}"
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return f"p50 {cuts[49]:8.1f}  p95 {cuts[94]:8.1f}  max {max(values):8.1f}"
+
+
+def run_session(session_id: int, args, client, manager, tools, system_message, conversations, executor, results, errors):
+    for iteration in range(args.iterations):
+        conversation = conversations[(session_id + iteration) % len(conversations)]
+        engine = ConversationEngine(
+            client,
+            manager,
+            tools,
+            messages=[{"role": "system", "content": system_message}],
+            stream=not args.no_stream,
+            executor=executor,
+            faq=FaqMatcher(system_message) if args.faq else None,
+            direct_render=args.direct_render,
+        )
+        for prompt in conversation:
+            try:
+                results.append(engine.send(prompt))
+            except Exception as e:
+                errors.append(f"session {session_id}: {e}")
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the conversation engine against a fake OpenAI server")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=2, help="Conversations replayed per session")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Fake server latency before the first token")
+    parser.add_argument("--token-delay-ms", type=float, default=20, help="Fake server delay between tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake server requests that fail")
+    parser.add_argument("--base-url", help="Use an already running server instead of starting one")
+    parser.add_argument("--no-stream", action="store_true", help="Request non-streamed completions")
+    parser.add_argument("--tool-workers", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=3, help="Client retries on 429/5xx")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Client limit on requests in flight")
+    parser.add_argument("--faq", action="store_true", help="Answer static questions locally")
+    parser.add_argument("--direct-render", action="store_true", help="Render single deterministic tool results without a second completion")
+    args = parser.parse_args()
+
+    server = None
+    if not args.base_url:
+        server = FakeOpenAIServer(first_token_ms=args.first_token_ms, token_delay_ms=args.token_delay_ms,
+                                  error_rate=args.error_rate).start()
+        args.base_url = server.base_url
+
+    workdir = tempfile.TemporaryDirectory()
+    manager = DataManager(storage=JsonStorage(Path(workdir.name) / "inquiries.jsonl", Path(workdir.name) / "calendar.json"))
+    manager.add_dummy_bookings()
+    tools = get_available_tools()
+    system_message = prepare_prompt(
+        str(ROOT / "src" / "prompts" / "system_message.txt"), date=datetime.now().strftime("%Y-%m-%d")
+    )
+    conversations = load_conversations()
+    executor = ThreadPoolExecutor(max_workers=args.tool_workers, thread_name_prefix="tool")
+    # One client shared by all sessions, as in the app
+    client = create_client("test", base_url=args.base_url, max_retries=args.max_retries,
+                           max_concurrency=args.max_concurrency)
+
+    results, errors = [], []
+    started = time.perf_counter()
+    sessions = [
+        threading.Thread(
+            target=run_session,
+            args=(i, args, client, manager, tools, system_message, conversations, executor, results, errors),
+        )
+        for i in range(args.sessions)
+    ]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+    if server is not None:
+        server.shutdown()
+    workdir.cleanup()
+
+    with_tools = [r for r in results if r.tool_calls]
+    print(f"Sessions: {args.sessions}, turns: {len(results)}, errors: {len(errors)}, wall time: {elapsed:.1f} s")
+    print(f"Throughput: {len(results) / elapsed:.1f} turns/s")
+    print("Latency per turn (ms):")
+    print(f"  total              {percentiles([r.total_ms for r in results])}")
+    print(f"  first token        {percentiles([r.first_token_ms for r in results if r.first_token_ms is not None])}")
+    print(f"  first completion   {percentiles([r.completion_ms[0] for r in results if r.completion_ms])}")
+    print(f"  tool wait          {percentiles([r.tools_wait_ms for r in with_tools])}")
+    print(f"  second completion  {percentiles([r.completion_ms[1] for r in with_tools if len(r.completion_ms) > 1])}")
+    print(
+        f"Turns with tool calls: {len(with_tools)}, answered locally: {sum(1 for r in results if r.faq)}, "
+        f"rendered directly: {sum(1 for r in results if r.direct_render)}"
+    )
+    print(f"OpenAI client: {client.stats()}")
+    print("Recorded spans (ms):")
+    for row in METRICS.summary():
+        print(f"  {row['metric']:24} {row['labels']:32} n={row['count']:<6} mean {row['mean_ms']:8.1f}  p95 <= {row['p95_ms']:g}")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
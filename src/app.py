@@ -1,32 +1,127 @@
 import streamlit as st
-from openai import OpenAI
+import atexit
 import os
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import time
 import pytz
 
 from utils import prepare_prompt, get_available_tools
 from data_manager import DataManager
-from functions import ChatFunctions
-
-# Create calendar.json if it doesn't exist
-calendar_path = "calendar.json"
-if not os.path.exists(calendar_path):
-    initial_calendar = {
-        "dvorana": {},
-        "sala_za_sastanke": {},
-        "ured": {}
-    }
-    with open(calendar_path, "w") as f:
-        json.dump(initial_calendar, f)
+from storage import JsonStorage, PartitionedStorage, SqliteStorage
+from history import HistoryManager
+from engine import ConversationEngine
+from faq import FaqMatcher
+from metrics import METRICS, start_server
+from openai_client import ServiceUnavailableError, create_client
+from inquiry_worker import InquiryWorker, notifiers_from_config
+from recurrence import RecurrenceStore, RecurringStorage
+from static_assets import LOGO_WIDTH, logo, parking_map
+
+rerun_started = time.perf_counter()
+
+
+@st.cache_resource
+def get_manager() -> DataManager:
+    """
+    Create the DataManager shared by all sessions of this server process.
+
+    Runs once per process: opens the configured storage backend (creating
+    calendar.json if it doesn't exist), starts the inquiry worker and, if
+    SEED_DUMMY_BOOKINGS is set, seeds the dummy bookings, so reruns never touch
+    the calendar.
+    """
+    backend = st.secrets.get("STORAGE_BACKEND", "json")
+    if backend == "sqlite":
+        storage = SqliteStorage(st.secrets.get("SQLITE_PATH", "reservations.db"))
+    elif backend == "partitioned":
+        # An existing calendar.json is split into monthly files on first start
+        storage = PartitionedStorage(st.secrets.get("CALENDAR_DIR", "calendar"))
+    else:
+        calendar_path = "calendar.json"
+        if not os.path.exists(calendar_path):
+            initial_calendar = {
+                "dvorana": {},
+                "sala_za_sastanke": {},
+                "ured": {}
+            }
+            with open(calendar_path, "w") as f:
+                json.dump(initial_calendar, f)
+        storage = JsonStorage(calendar_path=calendar_path)
+
+    # Recurring bookings are kept as rules and added to the days as they are read
+    storage = RecurringStorage(storage, RecurrenceStore(st.secrets.get("RECURRING_PATH", "recurring.json")))
+
+    # Inquiries are saved and staff notified off the request path
+    inquiry_worker = InquiryWorker(storage.append_inquiry, notifiers_from_config(st.secrets))
+    atexit.register(inquiry_worker.close)
+
+    manager = DataManager(storage=storage, inquiry_worker=inquiry_worker)
+    if st.secrets.get("SEED_DUMMY_BOOKINGS", False):
+        # Replaces the next 30 days of the calendar; only for local testing
+        manager.add_dummy_bookings()
+    return manager
+
+
+@st.cache_resource
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool for read-only tool calls, shared by all sessions."""
+    return ThreadPoolExecutor(max_workers=st.secrets.get("TOOL_WORKERS", 4), thread_name_prefix="tool")
+
+
+@st.cache_resource
+def get_openai_client():
+    """
+    One OpenAI client per process: its keep-alive connection pool, concurrency
+    limit, retries and circuit breaker are shared by all sessions.
+    """
+    return create_client(
+        st.secrets["OPENAI_API_KEY"],
+        base_url=st.secrets.get("OPENAI_BASE_URL"),
+        timeout=st.secrets.get("OPENAI_TIMEOUT", 60.0),
+        max_retries=st.secrets.get("OPENAI_MAX_RETRIES", 3),
+        max_concurrency=st.secrets.get("OPENAI_MAX_CONCURRENCY", 8),
+        failure_threshold=st.secrets.get("OPENAI_CIRCUIT_THRESHOLD", 5),
+        reset_timeout=st.secrets.get("OPENAI_CIRCUIT_RESET", 30.0),
+    )
+
+
+@st.cache_resource
+def get_tools() -> list:
+    """Tool definitions, built once per process."""
+    return get_available_tools()
 
-st.image("src/assets/ida_logo.jpg", width=200)
+
+@st.cache_data
+def get_system_message(date: str) -> str:
+    """System prompt for a date; the template is read once per process and day."""
+    return prepare_prompt(os.path.join("src", "prompts", "system_message.txt"), date=date)
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Expose /metrics for Prometheus on METRICS_PORT, once per process."""
+    port = st.secrets.get("METRICS_PORT")
+    return start_server(int(port), st.secrets.get("METRICS_HOST", "127.0.0.1")) if port else None
+
+
+get_metrics_server()
+
+
+def write_metrics_textfile():
+    if st.secrets.get("METRICS_TEXTFILE"):
+        METRICS.write_textfile(st.secrets["METRICS_TEXTFILE"])
+
+
+st.image(logo(), width=LOGO_WIDTH)
 
 st.title("Chatbot za rezevaciju prostora")
 
-manager = DataManager()
-manager.add_dummy_bookings()  # Initialize some dummy bookings for testing
-tools = get_available_tools()
+manager = get_manager()
+tool_executor = get_tool_executor()
+tools = get_tools()
 
 # Add initial system and assistant messages
 if "messages" not in st.session_state:
@@ -37,11 +132,14 @@ if "messages" not in st.session_state:
     current_date = current_datetime.strftime("%Y-%m-%d")
     current_time = current_datetime.strftime("%H:%M")
 
-    system_message = prepare_prompt(
-        os.path.join("src", "prompts", "system_message.txt"),
-        date=current_date,
-    )
+    system_message = get_system_message(current_date)
     st.session_state.messages.append({"role": "system", "content": system_message})
+    # Static questions (hours, prices, address...) are answered from the prompt itself
+    st.session_state.faq = (
+        FaqMatcher(system_message, threshold=st.secrets.get("FAQ_THRESHOLD", 0.8))
+        if st.secrets.get("FAQ_FAST_PATH", False)
+        else None
+    )
 
     initial_assistant_msg = {
         "role": "assistant",
@@ -50,38 +148,60 @@ if "messages" not in st.session_state:
 
     st.session_state.messages.append(initial_assistant_msg)
 
-for msg in st.session_state.messages:
-    if isinstance(msg, dict) and msg["role"] in ["user", "assistant"]:
-        with st.chat_message(msg["role"]):
-            st.write(msg["content"])
-            # Show parking image if assistant mentions parking
-            if msg["role"] == "assistant" and "parking" in msg["content"].lower():
-                st.image("src/assets/parking.png", caption="Parking lokacija")
+def mentions_parking(msg) -> bool:
+    return msg["role"] == "assistant" and "parking" in msg["content"].lower()
+
+
+def render_messages(messages: list, parking_message) -> bool:
+    """Draw chat bubbles for messages; returns whether the parking map was among them."""
+    parking_shown = False
+    for msg in messages:
+        if isinstance(msg, dict) and msg["role"] in ["user", "assistant"] and msg.get("content"):
+            with st.chat_message(msg["role"]):
+                st.write(msg["content"])
+                if msg is parking_message:
+                    st.image(parking_map(), caption="Parking lokacija")
+                    parking_shown = True
+    return parking_shown
+
+
+def latest_parking_message():
+    """The parking map is shown once, under the latest assistant message that mentions parking."""
+    return next(
+        (msg for msg in reversed(st.session_state.messages) if isinstance(msg, dict) and msg.get("content")
+         and mentions_parking(msg)),
+        None,
+    )
+
+
+# A full script run draws the history up to here; turns after it are drawn by the
+# chat fragment below, so submitting a message does not redraw the whole conversation
+st.session_state.history_end = len(st.session_state.messages)
+history_parking_shown = render_messages(st.session_state.messages, latest_parking_message())
+
+# Render assistant tokens as they arrive instead of waiting for the full response
+stream_responses = st.secrets.get("STREAM_RESPONSES", True)
+
+# Only a token-budgeted view of the conversation is sent to the model
+if "history" not in st.session_state:
+    st.session_state.history = HistoryManager(max_tokens=st.secrets.get("HISTORY_TOKEN_BUDGET", 8000))
+    st.session_state.prompt_tokens = []
 
 # Add reservation_completed flag to session state if not present
 if "reservation_completed" not in st.session_state:
     st.session_state.reservation_completed = False
 
-def handle_function_call(manager, function_name, arguments):
-    if function_name == ChatFunctions.COLLECT_CONTACT.value:
-        result = manager.collect_contact(
-            arguments.get("name"),
-            arguments.get("contact_type"),
-            arguments.get("contact_value"),
-            arguments.get("space_type"),
-            arguments.get("requirements"),
-        )
-        print("\nContact information collected:", result)
-        
-        # Set reservation completed flag
-        st.session_state.reservation_completed = True
-        
-        # Get current time in CET
-        cet = pytz.timezone('CET')
-        current_time_cet = datetime.now(cet)
-        
-        # Create formatted text content for the current reservation
-        reservation_text = f"""DETALJI REZERVACIJE
+def show_reservation_details(arguments):
+    """Mark the reservation as completed and offer its details for download."""
+    # Set reservation completed flag
+    st.session_state.reservation_completed = True
+    
+    # Get current time in CET
+    cet = pytz.timezone('CET')
+    current_time_cet = datetime.now(cet)
+    
+    # Create formatted text content for the current reservation
+    reservation_text = f"""DETALJI REZERVACIJE
 ========================
 Datum izdavanja: {current_time_cet.strftime("%Y-%m-%d %H:%M:%S")} CET
 
@@ -94,104 +214,122 @@ Tip prostora: {arguments.get("space_type")}
 DODATNI ZAHTJEVI
 ------------------------"""
 
-        if arguments.get("requirements"):
-            for key, value in arguments.get("requirements").items():
-                reservation_text += f"\n{key}: {value}"
-        else:
-            reservation_text += "\nNema dodatnih zahtjeva"
-        
-        # Create download button
-        st.download_button(
-            label="Preuzmi detalje rezervacije",
-            data=reservation_text,
-            file_name=f"rezervacija_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-            mime='text/plain'
-        )
-        
-        return result
-    elif function_name == ChatFunctions.CHECK_AVAILABILITY.value:
-        result = manager.check_availability(
-            arguments.get("space_type"),
-            arguments.get("date"),
-            arguments.get("start_time"),
-            arguments.get("end_time")
-        )
-        print("\nAvailability check result:", result)
-        return result
-    elif function_name == ChatFunctions.GET_AVAILABLE_SLOTS.value:
-        available_slots = manager.get_available_slots(
-            arguments.get("space_type"),
-            arguments.get("date")
-        )
-        slots_text = ", ".join([f"{start}-{end}" for start, end in available_slots])
-        print("\nAvailable slots:", available_slots)
-        return f"Za taj dan, slobodni termini su: {slots_text}"
+    if arguments.get("requirements"):
+        for key, value in arguments.get("requirements").items():
+            reservation_text += f"\n{key}: {value}"
     else:
-        raise ValueError(f"Function '{function_name}' not found.")
-
-if st.session_state.reservation_completed:
-    st.info("Rezervacija je završena.")
-    if st.chat_input():
-        st.chat_message("assistant").write("Vaša rezervacija je već završena. Ako želite napraviti novu rezervaciju, molimo vas osvježite stranicu.")
-elif prompt := st.chat_input():
-    if not st.secrets["OPENAI_API_KEY"]:
-        st.info("Please add your OpenAI API key to continue.")
-        st.stop()
-
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    st.chat_message("user").write(prompt)
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o", messages=st.session_state.messages, tools=tools, temperature=0.4
-        )
-    except Exception as e:
-        print(f"OpenAI API Error: {str(e)}")
-        st.error("Oprostite, došlo je do tehničke poteškoće. Molim vas osvježite stranicu i pokušajte ponovno.")
-        st.stop()
-
-    if response.choices[0].message.content is not None:
-        msg = response.choices[0].message.content
-        st.session_state.messages.append({"role": "assistant", "content": msg})
-        with st.chat_message("assistant"):
-            st.write(msg)
-            if "parking" in msg.lower():
-                st.image("src/assets/parking.png", caption="Parking lokacija")
-    elif response.choices[0].message.tool_calls:
-        # Store the assistant's message with tool calls
-        st.session_state.messages.append(response.choices[0].message)
-        
-        # Handle all tool calls in the response
-        for tool_call in response.choices[0].message.tool_calls:
-            function_name = tool_call.function.name
-            arguments = json.loads(tool_call.function.arguments)
-            print(f"\nCall function {function_name} with arguments: {arguments}")
-            
-            result = handle_function_call(manager, function_name, arguments)
-            
-            # Add the tool response message
-            st.session_state.messages.append({
-                "role": "tool",
-                "content": str(result),
-                "tool_call_id": tool_call.id,
-            })
+        reservation_text += "\nNema dodatnih zahtjeva"
+    
+    # Create download button
+    st.download_button(
+        label="Preuzmi detalje rezervacije",
+        data=reservation_text,
+        file_name=f"rezervacija_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+        mime='text/plain'
+    )
 
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o", messages=st.session_state.messages, tools=tools
+# Turns drawn by the fragment are folded into the full-run history after this many,
+# which keeps a fragment rerun from growing with the conversation
+FRAGMENT_MAX_TURNS = 5
+
+
+@st.fragment
+def chat():
+    """New turns and the chat input; a submitted message reruns only this function."""
+    fragment_started = time.perf_counter()
+    new_messages = st.session_state.messages[st.session_state.history_end:]
+    # The history drawn by the last full run stays on screen during fragment reruns. The map
+    # is shown once per script run: if that history already has it, new turns don't get another
+    fragment_parking_message = None if history_parking_shown else latest_parking_message()
+    parking_shown = render_messages(new_messages, fragment_parking_message) or history_parking_shown
+
+    if st.session_state.reservation_completed:
+        st.info("Rezervacija je završena.")
+        if st.chat_input():
+            st.chat_message("assistant").write("Vaša rezervacija je već završena. Ako želite napraviti novu rezervaciju, molimo vas osvježite stranicu.")
+    elif prompt := st.chat_input():
+        if not st.secrets["OPENAI_API_KEY"]:
+            st.info("Please add your OpenAI API key to continue.")
+            st.stop()
+
+        if "engine" not in st.session_state:
+            st.session_state.engine = ConversationEngine(
+                get_openai_client(),
+                manager,
+                tools,
+                messages=st.session_state.messages,
+                history=st.session_state.history,
+                stream=stream_responses,
+                executor=tool_executor,
+                faq=st.session_state.faq,
+                direct_render=st.secrets.get("DIRECT_RENDER", False),
             )
+        engine = st.session_state.engine
+        engine.on_contact_collected = show_reservation_details
+
+        st.chat_message("user").write(prompt)
+
+        # Each assistant message gets its own chat bubble, created on its first token
+        output = {"container": None, "placeholder": None, "text": "", "parking_shown": parking_shown}
+
+        def on_text(token):
+            if output["container"] is None:
+                output["container"] = st.chat_message("assistant")
+                output["placeholder"] = output["container"].empty()
+            output["text"] += token
+            output["placeholder"].markdown(output["text"] + "▌")
+
+        def on_message(text):
+            output["placeholder"].markdown(text)
+            if "parking" in text.lower() and not output["parking_shown"]:
+                output["container"].image(parking_map(), caption="Parking lokacija")
+                output["parking_shown"] = True
+            output.update(container=None, placeholder=None, text="")
+
+        try:
+            turn = engine.send(prompt, on_text=on_text, on_message=on_message)
+        except ServiceUnavailableError as e:
+            # The circuit breaker is open or the request queue is full; nothing was sent
+            logging.warning(f"OpenAI API unavailable: {e}")
+            st.error("Usluga je trenutno preopterećena. Molim vas pokušajte ponovno za minutu.")
+            st.stop()
         except Exception as e:
-            print(f"OpenAI API Error: {str(e)}")
-            st.error("Oprostite, došlo je do tehničke poteškoće. Molim vas osvježite stranicu i pokušajte ponovno.")
+            # The failed turn was dropped from the conversation, so the message can be sent again
+            logging.exception(f"OpenAI API Error: {e}")
+            st.error("Oprostite, došlo je do tehničke poteškoće. Molim vas pokušajte ponovno.")
             st.stop()
 
-        if response.choices[0].message.content is not None:
-            msg = response.choices[0].message.content
-            st.session_state.messages.append({"role": "assistant", "content": msg})
-            with st.chat_message("assistant"):
-                st.write(msg)
-                if "parking" in msg.lower():
-                    st.image("src/assets/parking.png", caption="Parking lokacija")
-    else:
-        raise ValueError("No response from OpenAI API")
+        st.session_state.prompt_tokens.extend(turn.prompt_tokens)
+        answered_by = "faq" if turn.faq else "direct_render" if turn.direct_render else "model"
+        METRICS.observe("chat_turn_seconds", turn.total_ms / 1000, answered_by=answered_by)
+        logging.debug(
+            f"Turn answered by {answered_by}: {turn.total_ms:.0f} ms total, "
+            f"first token after {turn.first_token_ms or 0:.0f} ms, "
+            f"completions {[round(ms) for ms in turn.completion_ms]} ms, prompt tokens {turn.prompt_tokens} "
+            f"(estimated {engine.history.last_prompt_tokens}, {engine.history.last_dropped_turns} old turns summarised)"
+        )
+
+    METRICS.observe("streamlit_fragment_seconds", time.perf_counter() - fragment_started)
+    write_metrics_textfile()
+    new_turns = sum(
+        1 for msg in st.session_state.messages[st.session_state.history_end:]
+        if isinstance(msg, dict) and msg["role"] == "user"
+    )
+    if new_turns >= FRAGMENT_MAX_TURNS:
+        st.rerun()
+
+
+chat()
+
+METRICS.observe("streamlit_rerun_seconds", time.perf_counter() - rerun_started)
+write_metrics_textfile()
+
+if st.secrets.get("DEBUG_METRICS", False):
+    with st.sidebar:
+        st.subheader("Latencija")
+        st.dataframe(METRICS.summary(), hide_index=True)
+        st.json({
+            "availability_cache": manager.cache_stats(),
+            "faq": st.session_state.faq.stats() if st.session_state.faq else None,
+            "openai": get_openai_client().stats() if st.secrets.get("OPENAI_API_KEY") else None,
+        })
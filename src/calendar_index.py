@@ -0,0 +1,126 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+WORK_START = 8 * 60  # 08:00
+WORK_END = 22 * 60  # 22:00
+
+
+def to_minutes(time_str: str) -> int:
+    """Convert a HH:MM string to minutes since midnight."""
+    hours, minutes = time_str.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def to_time_str(minutes: int) -> str:
+    """Convert minutes since midnight back to a HH:MM string."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class DayIndex:
+    """
+    Bookings of one space on one date, kept as sorted minute-offset intervals.
+
+    Alongside the sorted start/end lists we keep a running maximum of end
+    times, so an overlap check is a single bisect even if stored bookings
+    overlap each other (e.g. after a manual edit of calendar.json).
+    """
+
+    __slots__ = ("starts", "ends", "_max_end")
+
+    def __init__(self, bookings: Iterable[Tuple[str, str]] = ()):
+        intervals = sorted((to_minutes(start), to_minutes(end)) for start, end in bookings)
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+        self._max_end = []
+        self._rebuild_max_end(0)
+
+    @classmethod
+    def from_minutes(cls, intervals: Iterable[Tuple[int, int]]) -> "DayIndex":
+        """Build an index from (start, end) pairs already in minutes."""
+        day = cls()
+        for start, end in sorted(intervals):
+            day.starts.append(start)
+            day.ends.append(end)
+        day._rebuild_max_end(0)
+        return day
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _rebuild_max_end(self, position: int):
+        del self._max_end[position:]
+        running = self._max_end[-1] if self._max_end else -1
+        for end in self.ends[position:]:
+            running = max(running, end)
+            self._max_end.append(running)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Return True if [start, end) intersects any booking. O(log n)."""
+        # Bookings starting before `end` are candidates; one of them overlaps
+        # iff the largest end among them lies after `start`.
+        position = bisect_left(self.starts, end)
+        return position > 0 and self._max_end[position - 1] > start
+
+    def add(self, start: int, end: int):
+        """Insert a booking, keeping the index sorted."""
+        position = bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self._rebuild_max_end(position)
+
+    def free_slots(self, day_start: int = WORK_START, day_end: int = WORK_END) -> List[Tuple[int, int]]:
+        """Return the gaps between bookings within [day_start, day_end)."""
+        slots = []
+        cursor = day_start
+        for start, end in zip(self.starts, self.ends):
+            if start > cursor:
+                slots.append((cursor, min(start, day_end)))
+            cursor = max(cursor, end)
+            if cursor >= day_end:
+                break
+        if cursor < day_end:
+            slots.append((cursor, day_end))
+        return [(start, end) for start, end in slots if start < end]
+
+    def to_json(self) -> List[Tuple[str, str]]:
+        return [(to_time_str(start), to_time_str(end)) for start, end in zip(self.starts, self.ends)]
+
+
+class CalendarIndex:
+    """
+    In-memory calendar: {space_type: {date_str: DayIndex}}.
+
+    Booking strings from calendar.json are parsed once, when the index is built.
+    """
+
+    def __init__(self, calendar: Dict[str, Dict[str, list]]):
+        self._spaces: Dict[str, Dict[str, DayIndex]] = {
+            space_type: {date: DayIndex(bookings) for date, bookings in dates.items()}
+            for space_type, dates in calendar.items()
+        }
+
+    def __contains__(self, space_type: str) -> bool:
+        return space_type in self._spaces
+
+    def day(self, space_type: str, date: str) -> DayIndex:
+        """Return the bookings for a date; an empty index if there are none."""
+        return self._spaces[space_type].get(date) or DayIndex()
+
+    def set_day(self, space_type: str, date: str, bookings: Iterable[Tuple[str, str]]):
+        self._spaces.setdefault(space_type, {})[date] = DayIndex(bookings)
+
+    def add_booking(self, space_type: str, date: str, start: int, end: int):
+        self._spaces.setdefault(space_type, {}).setdefault(date, DayIndex()).add(start, end)
+
+    def iter_days(self) -> Iterator[Tuple[str, str, DayIndex]]:
+        """Yield (space_type, date, day) for every stored day, ordered by space and date."""
+        for space_type in sorted(self._spaces):
+            dates = self._spaces[space_type]
+            for date in sorted(dates):
+                yield space_type, date, dates[date]
+
+    def to_json(self) -> Dict[str, Dict[str, list]]:
+        return {
+            space_type: {date: day.to_json() for date, day in dates.items()}
+            for space_type, dates in self._spaces.items()
+        }
@@ -0,0 +1,364 @@
+"""
+Bulk calendar import and export for external booking systems.
+
+Bookings are read in chunks (CSV through polars' batched reader, iCal line by
+line) and merged into the storage backend one chunk at a time, so years of
+bookings can be synced without loading the whole source into memory.
+
+    python src/calendar_sync.py import bookings.csv
+    python src/calendar_sync.py import facility.ics --space dvorana --sqlite reservations.db
+    python src/calendar_sync.py export calendar.ics
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import argparse
+import csv
+import logging
+import time
+
+import polars as pl
+
+from calendar_index import WORK_END, WORK_START, to_time_str
+from recurrence import RecurrenceStore, RecurringStorage
+from storage import BOOKABLE_SPACES, JsonStorage, PartitionedStorage, SqliteStorage, Storage
+
+CSV_COLUMNS = ("space_type", "date", "start_time", "end_time")
+LOCAL_TIMEZONE = ZoneInfo("Europe/Zagreb")
+SPACE_NAMES = {"dvorana": "Konferencijska dvorana", "sala_za_sastanke": "Sala za sastanke"}
+# Matched against LOCATION/SUMMARY of iCal events without an X-SPACE-TYPE
+SPACE_KEYWORDS = {"dvorana": ("dvoran", "konferencij"), "sala_za_sastanke": ("sala", "sastan")}
+MAX_REPORTED_CONFLICTS = 20
+# Outlook/Exchange write Windows zone names as TZID; the European ones we are likely to see
+WINDOWS_TIMEZONES = {
+    "Central Europe Standard Time": "Europe/Zagreb",
+    "Central European Standard Time": "Europe/Zagreb",
+    "W. Europe Standard Time": "Europe/Berlin",
+    "Romance Standard Time": "Europe/Paris",
+    "GMT Standard Time": "Europe/London",
+    "E. Europe Standard Time": "Europe/Chisinau",
+    "FLE Standard Time": "Europe/Kyiv",
+    "GTB Standard Time": "Europe/Bucharest",
+    "UTC": "UTC",
+}
+
+Event = Tuple[str, str, int, int]  # (space_type, date, start_minute, end_minute)
+
+
+@dataclass
+class SyncReport:
+    """Counters of one import or export run."""
+
+    events: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    conflicts: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    conflict_samples: List[str] = field(default_factory=list)
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+
+def _minutes(column: str) -> pl.Expr:
+    parsed = pl.col(column).str.strip_chars().str.strptime(pl.Time, "%H:%M", strict=False)
+    return (parsed.dt.hour().cast(pl.Int32) * 60 + parsed.dt.minute().cast(pl.Int32)).alias(column)
+
+
+def _csv_batches(path: Path, chunk_size: int) -> Iterator[pl.DataFrame]:
+    schema = {column: pl.String for column in CSV_COLUMNS}
+    lazy = pl.scan_csv(path, schema_overrides=schema).select(CSV_COLUMNS)
+    if hasattr(lazy, "collect_batches"):
+        yield from lazy.collect_batches(chunk_size=chunk_size)
+        return
+    # Older polars releases only have the batched eager reader
+    reader = pl.read_csv_batched(path, batch_size=chunk_size, schema_overrides=schema, columns=list(CSV_COLUMNS))
+    while batches := reader.next_batches(1):
+        yield from batches
+
+
+def read_csv(path: Path, report: SyncReport, chunk_size: int = 5000) -> Iterator[List[Event]]:
+    """
+    Yield chunks of valid events from a CSV file with space_type,date,start_time,end_time columns.
+
+    Rows with an unknown space, a malformed date or time, or an end before
+    the start are counted as invalid and skipped.
+    """
+    for batch in _csv_batches(path, chunk_size):
+        events = (
+            batch.select(
+                pl.col("space_type").str.strip_chars(),
+                pl.col("date").str.strip_chars().str.strptime(pl.Date, "%Y-%m-%d", strict=False)
+                .dt.to_string("%Y-%m-%d"),
+                _minutes("start_time"),
+                _minutes("end_time"),
+            )
+            .drop_nulls()
+            .filter(pl.col("space_type").is_in(BOOKABLE_SPACES) & (pl.col("end_time") > pl.col("start_time")))
+        )
+        report.events += batch.height
+        report.invalid += batch.height - events.height
+        yield list(events.iter_rows())
+
+
+def _unfolded_lines(f) -> Iterator[str]:
+    """Join iCal continuation lines (starting with a space or tab) to their property."""
+    current = None
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _parse_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    head, _, value = line.partition(":")
+    name, *params = head.split(";")
+    return name.upper(), dict(param.split("=", 1) for param in params if "=" in param), value
+
+
+def _parse_ical_time(value: str, params: Dict[str, str]):
+    """Return a local datetime, or a date for all-day values."""
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").date()
+    if value.endswith("Z"):
+        moment = datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+    else:
+        moment = datetime.strptime(value, "%Y%m%dT%H%M%S")
+        if "TZID" in params:
+            name = params["TZID"].strip('"')
+            moment = moment.replace(tzinfo=ZoneInfo(WINDOWS_TIMEZONES.get(name, name)))
+    # Floating times are already local
+    return moment.astimezone(LOCAL_TIMEZONE).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _event_from_properties(properties: Dict[str, tuple], default_space: Optional[str]) -> Optional[Event]:
+    space_type = properties.get("X-SPACE-TYPE", (None, ""))[1].strip() or None
+    if space_type is None:
+        text = " ".join(properties.get(name, (None, ""))[1] for name in ("LOCATION", "SUMMARY")).lower()
+        matches = [space for space, keywords in SPACE_KEYWORDS.items() if any(k in text for k in keywords)]
+        space_type = matches[0] if len(matches) == 1 else default_space
+    if space_type not in BOOKABLE_SPACES or "DTSTART" not in properties:
+        return None
+
+    start = _parse_ical_time(properties["DTSTART"][1], properties["DTSTART"][0])
+    if "DTEND" in properties:
+        end = _parse_ical_time(properties["DTEND"][1], properties["DTEND"][0])
+    else:
+        end = start
+    if not isinstance(start, datetime):
+        # An all-day event blocks the whole working day
+        return (space_type, start.isoformat(), WORK_START, WORK_END)
+    if not isinstance(end, datetime) or end.date() != start.date():
+        return None  # events spanning midnight are not bookable here
+    start_minute = start.hour * 60 + start.minute
+    end_minute = end.hour * 60 + end.minute
+    if end_minute <= start_minute:
+        return None
+    return (space_type, start.date().isoformat(), start_minute, end_minute)
+
+
+def iter_ical_events(path: Path, report: SyncReport, default_space: Optional[str] = None) -> Iterator[Event]:
+    """Stream VEVENTs from an iCal file as events; unusable ones are counted as invalid."""
+    with open(path, "r", encoding="utf-8") as f:
+        properties = None
+        for line in _unfolded_lines(f):
+            name, params, value = _parse_property(line)
+            if name == "BEGIN" and value.upper() == "VEVENT":
+                properties = {}
+            elif name == "END" and value.upper() == "VEVENT" and properties is not None:
+                report.events += 1
+                if properties.get("STATUS", (None, ""))[1].upper() == "CANCELLED":
+                    report.invalid += 1
+                else:
+                    try:
+                        event = _event_from_properties(properties, default_space)
+                    except (ValueError, ZoneInfoNotFoundError):
+                        event = None  # malformed value or a time zone we do not know
+                    if event is None:
+                        report.invalid += 1
+                    else:
+                        yield event
+                properties = None
+            elif properties is not None:
+                properties[name] = (params, value)
+
+
+def read_ical(path: Path, report: SyncReport, chunk_size: int = 5000,
+              default_space: Optional[str] = None) -> Iterator[List[Event]]:
+    """Yield chunks of valid events from an iCal file."""
+    events = iter_ical_events(path, report, default_space)
+    while chunk := list(islice(events, chunk_size)):
+        yield chunk
+
+
+def merge_chunk(storage: Storage, events: List[Event], report: SyncReport):
+    """
+    Add a chunk of events to the store in one write.
+
+    Events already stored exactly are counted as duplicates, so a sync can be
+    re-run. Events overlapping a stored booking or an earlier event are
+    conflicts: they are skipped and reported, existing bookings are never changed.
+    Pass a RecurringStorage to treat occurrences of recurring bookings as stored.
+    """
+    stored = {}
+    new_events = []
+    for event in events:
+        space_type, date, start, end = event
+        key = (space_type, date)
+        if key not in stored:
+            day = storage.day(space_type, date)
+            stored[key] = set(zip(day.starts, day.ends))
+        if (start, end) in stored[key]:
+            report.duplicates += 1
+        else:
+            new_events.append(event)
+
+    for event, added in zip(new_events, storage.add_bookings(new_events) if new_events else []):
+        if added:
+            report.imported += 1
+            continue
+        report.conflicts += 1
+        if len(report.conflict_samples) < MAX_REPORTED_CONFLICTS:
+            space_type, date, start, end = event
+            report.conflict_samples.append(f"{space_type} {date} {to_time_str(start)}-{to_time_str(end)}")
+
+
+def _detect_format(path: Path, fmt: Optional[str]) -> str:
+    fmt = fmt or path.suffix.lower().lstrip(".")
+    if fmt in ("ics", "ical"):
+        return "ics"
+    if fmt == "csv":
+        return "csv"
+    raise ValueError(f"Unknown calendar format for {path}; use --format csv or ics")
+
+
+def import_calendar(storage: Storage, path: str, fmt: Optional[str] = None, chunk_size: int = 5000,
+                    default_space: Optional[str] = None) -> SyncReport:
+    """
+    Import bookings from a CSV or iCal file, merging them chunk by chunk.
+
+    Args:
+        storage: Storage backend to merge into
+        path: Source file
+        fmt: 'csv' or 'ics'; taken from the file extension if not given
+        chunk_size: Number of events read and written at a time
+        default_space: Space for iCal events whose space cannot be recognised
+
+    Returns:
+        SyncReport: Counts of imported, duplicate, conflicting and invalid events
+    """
+    path = Path(path)
+    report = SyncReport()
+    started = time.perf_counter()
+    if _detect_format(path, fmt) == "csv":
+        chunks = read_csv(path, report, chunk_size)
+    else:
+        chunks = read_ical(path, report, chunk_size, default_space)
+    for chunk in chunks:
+        merge_chunk(storage, chunk, report)
+        logging.info(f"Imported {report.imported} of {report.events} events from {path}")
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _utc_time(date: str, minutes: int) -> str:
+    """Local date and minute offset as an iCal UTC time, which needs no VTIMEZONE."""
+    local = datetime.fromisoformat(date).replace(hour=minutes // 60, minute=minutes % 60, tzinfo=LOCAL_TIMEZONE)
+    return local.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ical_lines(days: Iterable) -> Iterator[str]:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield from ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Coworking Pula//Hall reservation chatbot//HR")
+    for space_type, date, day in days:
+        compact_date = date.replace("-", "")
+        for start, end in zip(day.starts, day.ends):
+            yield from (
+                "BEGIN:VEVENT",
+                f"UID:{space_type}-{compact_date}-{start:04d}-{end:04d}@coworking-pula",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{_utc_time(date, start)}",
+                f"DTEND:{_utc_time(date, end)}",
+                "SUMMARY:Rezervirano",
+                f"LOCATION:{SPACE_NAMES.get(space_type, space_type)}",
+                f"X-SPACE-TYPE:{space_type}",
+                "END:VEVENT",
+            )
+    yield "END:VCALENDAR"
+
+
+def export_calendar(storage: Storage, path: str, fmt: Optional[str] = None) -> SyncReport:
+    """Write all stored bookings to a CSV or iCal file, one day at a time."""
+    path = Path(path)
+    report = SyncReport()
+    started = time.perf_counter()
+
+    def counted_days():
+        for space_type, date, day in storage.iter_days():
+            report.events += len(day)
+            yield space_type, date, day
+
+    if _detect_format(path, fmt) == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for space_type, date, day in counted_days():
+                writer.writerows((space_type, date, to_time_str(start), to_time_str(end))
+                                 for start, end in zip(day.starts, day.ends))
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for line in _ical_lines(counted_days()):
+                f.write(line + "\r\n")
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export the booking calendar as CSV or iCal")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="CSV (.csv) or iCal (.ics) file")
+    parser.add_argument("--format", choices=["csv", "ics"], help="Override the format taken from the extension")
+    parser.add_argument("--calendar", default="calendar.json", help="JSON calendar to use")
+    parser.add_argument("--sqlite", help="Use this SQLite database instead of the JSON calendar")
+    parser.add_argument("--partitioned", help="Use this month-partitioned calendar directory instead of the JSON calendar")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Events read and merged at a time")
+    parser.add_argument("--space", choices=BOOKABLE_SPACES, help="Space for iCal events without a recognisable location")
+    parser.add_argument("--rules", default="recurring.json", help="Recurring booking rules that imported events must not overlap")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.sqlite:
+        storage = SqliteStorage(args.sqlite)
+    elif args.partitioned:
+        storage = PartitionedStorage(args.partitioned)
+    else:
+        storage = JsonStorage(calendar_path=args.calendar)
+    # As in the app, occurrences of recurring bookings count as taken
+    storage = RecurringStorage(storage, RecurrenceStore(args.rules))
+
+    if args.command == "import":
+        report = import_calendar(storage, args.path, args.format, args.chunk_size, args.space)
+        print(
+            f"Read {report.events} events in {report.seconds:.1f} s ({report.events_per_second:.0f} events/s): "
+            f"{report.imported} imported, {report.duplicates} already present, "
+            f"{report.conflicts} conflicts, {report.invalid} invalid"
+        )
+        for conflict in report.conflict_samples:
+            print(f"  conflict: {conflict}")
+        if report.conflicts > len(report.conflict_samples):
+            print(f"  ... and {report.conflicts - len(report.conflict_samples)} more")
+    else:
+        report = export_calendar(storage, args.path, args.format)
+        print(f"Exported {report.events} bookings to {args.path} in {report.seconds:.1f} s "
+              f"({report.events_per_second:.0f} bookings/s)")
@@ -1,100 +1,160 @@
-from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterator, Optional
+import heapq
 import json
-from datetime import datetime, timedelta
+from datetime import date as date_type, datetime, timedelta
+from itertools import islice
 import logging
 
+from calendar_index import WORK_START, WORK_END, to_minutes, to_time_str
+from inquiry_worker import InquiryWorker
+from occupancy import OccupancyEngine
+from result_cache import VersionedCache
+from storage import BOOKABLE_SPACES, Storage, JsonStorage
+
+SLOT_AVAILABLE = "Prostor je dostupan u traženom terminu."
+SLOT_TAKEN = "Termin je već rezerviran."
+
 
 class DataManager:
     """
     Class for managing contact information, inquiries and space availability.
     """
 
-    def __init__(self, json_path: str = "inquiries.json", calendar_path: str = "calendar.json"):
-        self.json_path = Path(json_path)
-        self.calendar_path = Path(calendar_path)
-        self._inquiries = []
-        self._calendar = {
-            "dvorana": {},  # {date_str: [(start_time, end_time)]}
-            "sala_za_sastanke": {}
-        }
-        
-        if self.json_path.exists():
-            with open(self.json_path, 'r', encoding='utf-8') as f:
-                self._inquiries = json.load(f)
-                
-        if self.calendar_path.exists():
-            with open(self.calendar_path, 'r', encoding='utf-8') as f:
-                self._calendar = json.load(f)
-
-    def _save_calendar(self):
-        """Save calendar data to JSON file."""
-        with open(self.calendar_path, 'w', encoding='utf-8') as f:
-            json.dump(self._calendar, f, indent=2, ensure_ascii=False)
+    def __init__(
+        self,
+        json_path: str = "inquiries.jsonl",
+        calendar_path: str = "calendar.json",
+        storage: Optional[Storage] = None,
+        cache_size: int = 2048,
+        inquiry_worker: Optional[InquiryWorker] = None,
+    ):
+        # The JSON files are the development default; see storage.SqliteStorage
+        self._storage = storage if storage is not None else JsonStorage(json_path, calendar_path)
+        self._cache = VersionedCache(cache_size)
+        # If set, inquiries are stored and staff notified in the background
+        self._inquiry_worker = inquiry_worker
 
-    def check_availability(self, space_type: str, date: str, start_time: str, end_time: str) -> str:
+    def cached(self, name: str, args: tuple, space_type: str, date: str, compute: Callable):
         """
-        Check if a space is available for the given time slot.
+        Memoise `compute()` until the bookings of `space_type` on `date` change.
         
         Args:
-            space_type: 'dvorana' or 'sala_za_sastanke'
-            date: Date in YYYY-MM-DD format
-            start_time: Start time in HH:MM format
-            end_time: End time in HH:MM format
-            
-        Returns:
-            str: Success or error message
+            name: Name of the cached operation
+            args: Remaining arguments the result depends on
+            space_type: Space whose bookings the result depends on
+            date: Date whose bookings the result depends on
+            compute: Produces the value on a miss
         """
+        # Read the version before the data, so a concurrent change can only cause a miss
+        version = self._storage.version(space_type, date)
+        return self._cache.get_or_compute((name, space_type, date) + tuple(args), version, compute)
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss counters of the availability result cache."""
+        return self._cache.stats()
+
+    def _validate_slot(self, space_type: str, date: str, start_time: str, end_time: str) -> Optional[str]:
+        """Return an error message if the slot cannot be booked at all, otherwise None."""
         if space_type == "ured":
             return "Uredi se iznajmljuju isključivo na mjesečnoj bazi."
         
         if space_type not in ["dvorana", "sala_za_sastanke"]:
             return "Nepostojeći tip prostora."
             
-        # Convert times to datetime objects for comparison
+        # Validate the requested times and convert them to minute offsets
         start_dt = datetime.strptime(f"{date} {start_time}", "%Y-%m-%d %H:%M")
-        end_dt = datetime.strptime(f"{date} {end_time}", "%Y-%m-%d %H:%M")
+        datetime.strptime(end_time, "%H:%M")
         
         # Check if date is in the past
         if start_dt < datetime.now():
             return "Nije moguće rezervirati termin u prošlosti."
         
         # Check if time is within working hours (8:00-22:00)
-        working_start = datetime.strptime(f"{date} 08:00", "%Y-%m-%d %H:%M")
-        working_end = datetime.strptime(f"{date} 22:00", "%Y-%m-%d %H:%M")
-        
-        if start_dt < working_start or end_dt > working_end:
+        if to_minutes(start_time) < WORK_START or to_minutes(end_time) > WORK_END:
             return "Termin je izvan radnog vremena (8-22h)."
         
-        # Get existing bookings for the date
-        date_bookings = self._calendar[space_type].get(date, [])
+        if to_minutes(end_time) <= to_minutes(start_time):
+            return "Završetak termina mora biti nakon njegova početka."
         
-        # Check for overlaps with existing bookings
-        for booking_start, booking_end in date_bookings:
-            booking_start_dt = datetime.strptime(f"{date} {booking_start}", "%Y-%m-%d %H:%M")
-            booking_end_dt = datetime.strptime(f"{date} {booking_end}", "%Y-%m-%d %H:%M")
+        return None
+
+    def check_availability(self, space_type: str, date: str, start_time: str, end_time: str) -> str:
+        """
+        Check if a space is available for the given time slot.
+        
+        Args:
+            space_type: 'dvorana' or 'sala_za_sastanke'
+            date: Date in YYYY-MM-DD format
+            start_time: Start time in HH:MM format
+            end_time: End time in HH:MM format
             
-            # Check if there's an overlap
-            if not (end_dt <= booking_start_dt or start_dt >= booking_end_dt):
-                return "Termin je već rezerviran."
+        Returns:
+            str: Success or error message
+        """
+        error = self._validate_slot(space_type, date, start_time, end_time)
+        if error:
+            return error
+        
+        # Check for overlaps with existing bookings
+        return self.cached(
+            "check_availability",
+            (start_time, end_time),
+            space_type,
+            date,
+            lambda: self._check_overlap(space_type, date, start_time, end_time),
+        )
+
+    def _check_overlap(self, space_type: str, date: str, start_time: str, end_time: str) -> str:
+        if space_type in self._storage and self._storage.day(space_type, date).overlaps(
+            to_minutes(start_time), to_minutes(end_time)
+        ):
+            return SLOT_TAKEN
                 
-        return "Prostor je dostupan u traženom terminu."
+        return SLOT_AVAILABLE
+
+    def book(self, space_type: str, date: str, start_time: str, end_time: str) -> str:
+        """
+        Book a time slot if it is still free; the check and the write are atomic.
+        
+        Args:
+            space_type: 'dvorana' or 'sala_za_sastanke'
+            date: Date in YYYY-MM-DD format
+            start_time: Start time in HH:MM format
+            end_time: End time in HH:MM format
+            
+        Returns:
+            str: Success or error message
+        """
+        error = self._validate_slot(space_type, date, start_time, end_time)
+        if error:
+            return error
+        
+        if not self._storage.book(space_type, date, to_minutes(start_time), to_minutes(end_time)):
+            return SLOT_TAKEN
+        
+        return "Termin je uspješno rezerviran."
 
     def add_dummy_bookings(self):
-        """Add dummy bookings for the next 30 days for testing purposes."""
+        """
+        Add dummy bookings for the next 30 days for testing purposes.
+
+        Meant to be called once when the shared manager is created, not per request.
+        Overwrites the bookings of those days, so never run it against real data.
+        """
         # Generate dates for the next 30 days
         dates = [(datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(30)]
         
+        days = []
         for date in dates:
             # Add random bookings with different patterns for each day
             if int(date[-2:]) % 2 == 0:  # Even days
-                self._calendar["dvorana"][date] = [("09:00", "12:00"), ("14:00", "17:00")]
-                self._calendar["sala_za_sastanke"][date] = [("10:00", "11:00"), ("15:00", "16:30")]
+                days.append(("dvorana", date, [("09:00", "12:00"), ("14:00", "17:00")]))
+                days.append(("sala_za_sastanke", date, [("10:00", "11:00"), ("15:00", "16:30")]))
             else:  # Odd days
-                self._calendar["dvorana"][date] = [("13:00", "18:00")]
-                self._calendar["sala_za_sastanke"][date] = [("09:00", "10:30"), ("14:00", "15:00")]
+                days.append(("dvorana", date, [("13:00", "18:00")]))
+                days.append(("sala_za_sastanke", date, [("09:00", "10:30"), ("14:00", "15:00")]))
         
-        self._save_calendar()
+        self._storage.set_days(days)
 
     def get_available_slots(self, space_type: str, date: str) -> list:
         """
@@ -110,34 +170,143 @@ class DataManager:
         if space_type == "ured":
             return []  # Offices are only available for monthly rent
             
-        if space_type not in self._calendar:
+        if space_type not in self._storage:
             return [("08:00", "22:00")]  # If space type doesn't exist, assume fully available
             
-        # Get occupied slots for the date
-        occupied_slots = self._calendar[space_type].get(date, [])
-        if not occupied_slots:
-            return [("08:00", "22:00")]  # If no bookings, fully available
-            
-        # Sort occupied slots by start time
-        occupied_slots.sort(key=lambda x: x[0])
+        # Gaps between the pre-sorted bookings within working hours
+        def compute():
+            free_slots = self._storage.day(space_type, date).free_slots(WORK_START, WORK_END)
+            return tuple((to_time_str(start), to_time_str(end)) for start, end in free_slots)
         
-        available_slots = []
-        current_time = "08:00"  # Start of business day
+        return list(self.cached("get_available_slots", (), space_type, date, compute))
+
+    @staticmethod
+    def _selected_spaces(space_type: str) -> list:
+        """Bookable spaces a search covers: one space, or all of them for 'svi'."""
+        if space_type == "svi":
+            return list(BOOKABLE_SPACES)
+        return [space_type] if space_type in BOOKABLE_SPACES else []
+
+    def find_free_windows(
+        self,
+        space_type: str,
+        start_date: str,
+        days: int,
+        duration_minutes: int,
+        from_time: str = "08:00",
+        to_time: str = "22:00",
+    ) -> list:
+        """
+        Find free windows of a given duration across several days and spaces.
         
-        # Check for available slot before first booking
-        if occupied_slots[0][0] > current_time:
-            available_slots.append((current_time, occupied_slots[0][0]))
+        Args:
+            space_type: 'dvorana', 'sala_za_sastanke' or 'svi' for both
+            start_date: First date in YYYY-MM-DD format
+            days: Number of days to search
+            duration_minutes: Minimum length of a window in minutes
+            from_time: Earliest start in HH:MM format
+            to_time: Latest end in HH:MM format
             
-        # Check for slots between bookings
-        for i in range(len(occupied_slots)-1):
-            if occupied_slots[i][1] < occupied_slots[i+1][0]:
-                available_slots.append((occupied_slots[i][1], occupied_slots[i+1][0]))
-                
-        # Check for available slot after last booking
-        if occupied_slots[-1][1] < "22:00":  # End of business day
-            available_slots.append((occupied_slots[-1][1], "22:00"))
+        Returns:
+            list: Dicts with space_type, date, start and end of each free window
+        """
+        spaces = self._selected_spaces(space_type)
+        
+        engine = OccupancyEngine(self._storage)
+        return engine.find_free_windows(
+            spaces,
+            start_date,
+            max(1, min(days, 62)),
+            duration_minutes,
+            to_minutes(from_time),
+            to_minutes(to_time),
+            now=datetime.now(),
+        )
+
+    def find_earliest_slots(
+        self,
+        space_type: str,
+        start_date: str,
+        duration_minutes: int,
+        count: int = 3,
+        from_time: str = "08:00",
+        to_time: str = "22:00",
+        max_days: int = 90,
+    ) -> list:
+        """
+        Find the earliest free windows of a given duration, searching forward day by day.
+        
+        Args:
+            space_type: 'dvorana', 'sala_za_sastanke' or 'svi' for both
+            start_date: First date to search in YYYY-MM-DD format
+            duration_minutes: Length of the window in minutes
+            count: Number of windows to return
+            from_time: Earliest start in HH:MM format
+            to_time: Latest end in HH:MM format
+            max_days: How far ahead to search at most
             
-        return available_slots
+        Returns:
+            list: Dicts with space_type, date, start, end (start + duration) and
+                free_until of each window, earliest first; at most one per free gap
+        """
+        spaces = self._selected_spaces(space_type)
+        if not spaces or duration_minutes <= 0:
+            return []
+        
+        windows = self._iter_earliest_windows(
+            spaces,
+            date_type.fromisoformat(start_date),
+            duration_minutes,
+            max(to_minutes(from_time), WORK_START),
+            min(to_minutes(to_time), WORK_END),
+            max(1, min(max_days, 366)),
+            datetime.now(),
+        )
+        # The generator stops reading the calendar as soon as enough windows are found
+        return list(islice(windows, max(1, min(count, 10))))
+
+    def _free_minutes(self, space_type: str, date: str) -> tuple:
+        """Free (start, end) minute pairs within working hours, cached like get_available_slots."""
+        if space_type not in self._storage:
+            return ((WORK_START, WORK_END),)
+        return self.cached(
+            "free_minutes", (), space_type, date,
+            lambda: tuple(self._storage.day(space_type, date).free_slots(WORK_START, WORK_END)),
+        )
+
+    def _iter_earliest_windows(
+        self,
+        spaces: list,
+        first_day: date_type,
+        duration: int,
+        day_start: int,
+        day_end: int,
+        max_days: int,
+        now: datetime,
+    ) -> Iterator[Dict]:
+        today = now.date()
+        # Start times are rounded up to the quarter hour
+        now_minutes = -(-(now.hour * 60 + now.minute) // 15) * 15
+        for offset in range(max_days):
+            day = first_day + timedelta(days=offset)
+            if day < today:
+                continue
+            earliest = max(day_start, now_minutes) if day == today else day_start
+            date = day.isoformat()
+            # Gaps of all spaces on this day, in order of start time
+            gaps = heapq.merge(
+                *([(start, end, space) for start, end in self._free_minutes(space, date)] for space in spaces)
+            )
+            for start, end, space in gaps:
+                start, end = max(start, earliest), min(end, day_end)
+                if end - start >= duration:
+                    yield {
+                        "space_type": space,
+                        "date": date,
+                        "start": to_time_str(start),
+                        "end": to_time_str(start + duration),
+                        "free_until": to_time_str(end),
+                    }
 
     def collect_contact(
         self,
@@ -157,7 +326,9 @@ class DataManager:
             "requirements": requirements,
         }
         
-        self._inquiries.append(inquiry)
+        if self._inquiry_worker is not None:
+            self._inquiry_worker.submit(inquiry)
+            return "Hvala na upitu! Kontaktirat ćemo Vas uskoro s ponudom."
         
         # Log the inquiry details
         logging.info("=== New Inquiry Received ===")
@@ -165,10 +336,15 @@ class DataManager:
         logging.info("===========================")
         
         try:
-            with open(self.json_path, 'w', encoding='utf-8') as f:
-                json.dump(self._inquiries, f, indent=2, ensure_ascii=False)
-            logging.info(f"Inquiry saved to {self.json_path}")
+            self._storage.append_inquiry(inquiry)
+            logging.info("Inquiry saved")
         except Exception as e:
-            logging.warning(f"Could not save inquiry to file: {str(e)}")
+            logging.warning(f"Could not save inquiry: {str(e)}")
         
         return "Hvala na upitu! Kontaktirat ćemo Vas uskoro s ponudom."
+
+    def iter_inquiries(self) -> Iterator[Dict]:
+        """Stream all stored inquiries, oldest first."""
+        if self._inquiry_worker is not None:
+            self._inquiry_worker.flush()
+        return self._storage.iter_inquiries()
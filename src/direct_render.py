@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from data_manager import DataManager, SLOT_AVAILABLE, SLOT_TAKEN
+from functions import ChatFunctions
+
+SPACE_NAMES = {"dvorana": "Konferencijska dvorana", "sala_za_sastanke": "Sala za sastanke"}
+
+
+def format_date(date: str) -> str:
+    """YYYY-MM-DD to the DD.MM.YYYY. format used in the conversation."""
+    return datetime.strptime(date, "%Y-%m-%d").strftime("%d.%m.%Y.")
+
+
+def render_availability(manager: DataManager, arguments: Dict, result: str) -> Optional[str]:
+    space = SPACE_NAMES.get(arguments.get("space_type"))
+    if space is None:
+        return None
+    period = f"{format_date(arguments['date'])} od {arguments['start_time']} do {arguments['end_time']}"
+    if result == SLOT_AVAILABLE:
+        return f"{space} je slobodna {period}. Želite li nastaviti s upitom za taj termin?"
+    if result == SLOT_TAKEN:
+        return f"Nažalost, {space.lower()} je {period} već zauzeta. Želite li da provjerim slobodne termine tog dana?"
+    # Validation errors (past date, outside working hours...) are left to the model to explain
+    return None
+
+
+def render_slots(manager: DataManager, arguments: Dict, result: str) -> Optional[str]:
+    space = SPACE_NAMES.get(arguments.get("space_type"))
+    if space is None:
+        return None
+    date = format_date(arguments["date"])
+    # Served from the availability cache filled by the tool call itself
+    slots = manager.get_available_slots(arguments["space_type"], arguments["date"])
+    if not slots:
+        return f"Nažalost, {space.lower()} je {date} potpuno zauzeta. Želite li da provjerim neki drugi dan?"
+    slots_text = ", ".join(f"{start}-{end}" for start, end in slots)
+    return f"{space} je {date} slobodna u terminima: {slots_text}. Koji termin vam odgovara?"
+
+
+# Tools whose result can be shown to the user without asking the model to rephrase it
+RENDERERS: Dict[str, Callable[[DataManager, Dict, str], Optional[str]]] = {
+    ChatFunctions.CHECK_AVAILABILITY.value: render_availability,
+    ChatFunctions.GET_AVAILABLE_SLOTS.value: render_slots,
+}
+
+
+def render_tool_result(manager: DataManager, function_name: str, arguments: Dict, result: str) -> Optional[str]:
+    """
+    Turn a single tool result into the final reply of the turn.
+
+    Args:
+        manager: DataManager the tool ran against
+        function_name: Name of the tool that was called
+        arguments: Arguments the model passed to the tool
+        result: Text the tool returned
+
+    Returns:
+        str or None: The reply, or None if the model should answer instead
+    """
+    renderer = RENDERERS.get(function_name)
+    if renderer is None:
+        return None
+    try:
+        return renderer(manager, arguments, result)
+    except (KeyError, ValueError):
+        return None  # unexpected arguments; let the model deal with them
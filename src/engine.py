@@ -0,0 +1,322 @@
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import json
+import logging
+import time
+
+from data_manager import DataManager
+from direct_render import render_tool_result
+from faq import FaqMatcher
+from functions import ChatFunctions, READ_ONLY_FUNCTIONS
+from history import HistoryManager
+from metrics import span
+from streaming import create_completion
+
+
+@dataclass
+class TurnResult:
+    """Outcome and latency breakdown of one user turn."""
+
+    reply: Optional[str] = None
+    tool_calls: List[str] = field(default_factory=list)
+    # Time from the user's message to the first visible token
+    first_token_ms: Optional[float] = None
+    completion_ms: List[float] = field(default_factory=list)
+    # Time spent waiting for tool results once the response had finished;
+    # the tools themselves start while the response is still streaming
+    tools_wait_ms: float = 0.0
+    total_ms: float = 0.0
+    prompt_tokens: List[int] = field(default_factory=list)
+    # Answered locally by the FAQ matcher, without calling the model
+    faq: bool = False
+    # Tool result rendered from a template instead of a second completion
+    direct_render: bool = False
+
+
+class ConversationEngine:
+    """
+    UI-independent conversation loop: sends the history to the model, runs the
+    requested tools and asks the model to answer with their results.
+
+    The Streamlit app and the load-test harness both drive this class; the UI
+    plugs in through callbacks.
+    """
+
+    def __init__(
+        self,
+        client,
+        manager: DataManager,
+        tools: list,
+        messages: Optional[List] = None,
+        history: Optional[HistoryManager] = None,
+        model: str = "gpt-4o",
+        stream: bool = True,
+        executor: Optional[Executor] = None,
+        on_contact_collected: Optional[Callable[[Dict], None]] = None,
+        faq: Optional[FaqMatcher] = None,
+        direct_render: bool = False,
+    ):
+        """
+        Args:
+            client: OpenAI-compatible client
+            manager: DataManager the tools operate on
+            tools: Tool definitions from `get_available_tools`
+            messages: Conversation so far, starting with the system prompt; appended to in place
+            history: Decides which part of the conversation is sent; defaults to a HistoryManager
+            model: Chat model name
+            stream: Whether to stream completions
+            executor: Pool for read-only tool calls; if None they run inline
+            on_contact_collected: Called with the arguments after collect_contact succeeds
+            faq: Answers static questions locally; if None every turn goes to the model
+            direct_render: End single-tool turns with a template reply when the tool supports it
+        """
+        self.client = client
+        self.manager = manager
+        self.tools = tools
+        self.messages = messages if messages is not None else []
+        self.history = history or HistoryManager()
+        self.model = model
+        self.stream = stream
+        self.executor = executor
+        self.on_contact_collected = on_contact_collected
+        self.faq = faq
+        self.direct_render = direct_render
+
+    def handle_function_call(self, function_name: str, arguments: Dict) -> str:
+        """Run one tool call and return its result as text for the model."""
+        with span("tool_call_seconds", function=function_name):
+            return self._dispatch(function_name, arguments)
+
+    def _dispatch(self, function_name: str, arguments: Dict) -> str:
+        manager = self.manager
+        if function_name == ChatFunctions.COLLECT_CONTACT.value:
+            result = manager.collect_contact(
+                arguments.get("name"),
+                arguments.get("contact_type"),
+                arguments.get("contact_value"),
+                arguments.get("space_type"),
+                arguments.get("requirements"),
+            )
+            logging.debug("Contact information collected")
+            if self.on_contact_collected:
+                self.on_contact_collected(arguments)
+            return result
+        elif function_name == ChatFunctions.CHECK_AVAILABILITY.value:
+            result = manager.check_availability(
+                arguments.get("space_type"),
+                arguments.get("date"),
+                arguments.get("start_time"),
+                arguments.get("end_time")
+            )
+            logging.debug(f"Availability check result: {result}")
+            return result
+        elif function_name == ChatFunctions.GET_AVAILABLE_SLOTS.value:
+            space_type, date = arguments.get("space_type"), arguments.get("date")
+
+            def format_slots():
+                available_slots = manager.get_available_slots(space_type, date)
+                slots_text = ", ".join([f"{start}-{end}" for start, end in available_slots])
+                return f"Za taj dan, slobodni termini su: {slots_text}"
+
+            # The formatted answer is cached until the bookings of that day change
+            result = manager.cached("slots_text", (), space_type, date, format_slots)
+            logging.debug(f"Available slots: {result}")
+            return result
+        elif function_name == ChatFunctions.FIND_FREE_WINDOWS.value:
+            windows = manager.find_free_windows(
+                arguments.get("space_type"),
+                arguments.get("start_date"),
+                arguments.get("days"),
+                arguments.get("duration_minutes"),
+                arguments.get("from_time"),
+                arguments.get("to_time")
+            )
+            logging.debug(f"Free windows: {windows}")
+            if not windows:
+                return "Nema slobodnih termina tražene duljine u tom razdoblju."
+            windows_text = "; ".join(
+                f"{window['space_type']} {window['date']} {window['start']}-{window['end']}" for window in windows
+            )
+            return f"Slobodni termini: {windows_text}"
+        elif function_name == ChatFunctions.FIND_EARLIEST_SLOTS.value:
+            slots = manager.find_earliest_slots(
+                arguments.get("space_type"),
+                arguments.get("start_date"),
+                arguments.get("duration_minutes"),
+                arguments.get("count"),
+                arguments.get("from_time"),
+                arguments.get("to_time")
+            )
+            logging.debug(f"Earliest slots: {slots}")
+            if not slots:
+                return "Nema slobodnih termina tražene duljine u idućih 90 dana."
+            slots_text = "; ".join(
+                f"{slot['space_type']} {slot['date']} {slot['start']}-{slot['end']} (slobodno do {slot['free_until']})"
+                for slot in slots
+            )
+            return f"Najraniji slobodni termini: {slots_text}"
+        else:
+            raise ValueError(f"Function '{function_name}' not found.")
+
+    def _complete(
+        self,
+        result: TurnResult,
+        turn_started: float,
+        on_text: Optional[Callable[[str], None]],
+        on_message: Optional[Callable[[str], None]],
+        run_tools: bool,
+        **kwargs,
+    ):
+        """One completion; returns the assistant message and the started tool calls."""
+        tool_results = {}
+        text = []
+        started = time.perf_counter()
+
+        def handle_text(token):
+            if result.first_token_ms is None:
+                result.first_token_ms = (time.perf_counter() - turn_started) * 1000
+            text.append(token)
+            if on_text:
+                on_text(token)
+
+        def handle_tool_call(tool_call):
+            function_name = tool_call["function"]["name"]
+            arguments = json.loads(tool_call["function"]["arguments"])
+            # Arguments are not logged: collect_contact carries names, e-mails and phone numbers
+            logging.debug(f"Calling {function_name}")
+            result.tool_calls.append(function_name)
+            if function_name in READ_ONLY_FUNCTIONS and self.executor is not None:
+                # Independent lookups run side by side on the shared pool
+                tool_results[tool_call["id"]] = self.executor.submit(
+                    self.handle_function_call, function_name, arguments
+                )
+            else:
+                # Writes (and anything touching the UI) run one by one on the calling thread
+                tool_results[tool_call["id"]] = self.handle_function_call(function_name, arguments)
+
+        message = create_completion(
+            self.client,
+            stream=self.stream,
+            on_text=handle_text,
+            on_tool_call=handle_tool_call if run_tools else None,
+            on_usage=lambda usage: result.prompt_tokens.append(usage.prompt_tokens),
+            model=self.model,
+            messages=self.history.build(self.messages),
+            tools=self.tools,
+            **kwargs,
+        )
+        result.completion_ms.append((time.perf_counter() - started) * 1000)
+        if text and on_message:
+            on_message("".join(text))
+        return message, tool_results
+
+    def _render_directly(self, message: Dict) -> Optional[str]:
+        """Template reply for a turn with one deterministic tool call, else None."""
+        if not self.direct_render or len(message["tool_calls"]) != 1:
+            # Several tool results need the model to combine them
+            return None
+        function = message["tool_calls"][0]["function"]
+        return render_tool_result(
+            self.manager, function["name"], json.loads(function["arguments"]), self.messages[-1]["content"]
+        )
+
+    def _local_reply(
+        self,
+        result: TurnResult,
+        started: float,
+        reply: str,
+        on_text: Optional[Callable[[str], None]],
+        on_message: Optional[Callable[[str], None]],
+    ) -> TurnResult:
+        """End the turn with a reply produced without the model."""
+        # Kept in the history, so the model knows what was already answered
+        self.messages.append({"role": "assistant", "content": reply})
+        if on_text:
+            on_text(reply)
+        if on_message:
+            on_message(reply)
+        result.reply = reply
+        result.total_ms = (time.perf_counter() - started) * 1000
+        if result.first_token_ms is None:
+            result.first_token_ms = result.total_ms
+        return result
+
+    def send(
+        self,
+        prompt: str,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_message: Optional[Callable[[str], None]] = None,
+    ) -> TurnResult:
+        """
+        Process one user message.
+
+        Args:
+            prompt: The user's message
+            on_text: Called with every assistant token as it arrives
+            on_message: Called with the full text once an assistant message is complete
+
+        Returns:
+            TurnResult: The final reply and where the time went
+        """
+        turn_start = len(self.messages)
+        try:
+            return self._send(prompt, on_text, on_message)
+        except BaseException:
+            # Drop the failed turn, so the history never ends in unanswered tool calls
+            # and the user can simply send the message again
+            del self.messages[turn_start:]
+            raise
+
+    def _send(
+        self,
+        prompt: str,
+        on_text: Optional[Callable[[str], None]],
+        on_message: Optional[Callable[[str], None]],
+    ) -> TurnResult:
+        result = TurnResult()
+        started = time.perf_counter()
+        self.messages.append({"role": "user", "content": prompt})
+
+        answer = self.faq.match(prompt) if self.faq else None
+        if answer is not None:
+            result.faq = True
+            return self._local_reply(result, started, answer, on_text, on_message)
+
+        message, tool_results = self._complete(result, started, on_text, on_message, run_tools=True, temperature=0.4)
+
+        if message.get("tool_calls"):
+            # Store the assistant's message with tool calls
+            self.messages.append(message)
+
+            # Add the tool response messages in the order the model requested them;
+            # the calls were started while the response streamed
+            tools_started = time.perf_counter()
+            for tool_call in message["tool_calls"]:
+                tool_result = tool_results[tool_call["id"]]
+                if isinstance(tool_result, Future):
+                    tool_result = tool_result.result()
+                self.messages.append({
+                    "role": "tool",
+                    "content": str(tool_result),
+                    "tool_call_id": tool_call["id"],
+                })
+            result.tools_wait_ms = (time.perf_counter() - tools_started) * 1000
+
+            reply = self._render_directly(message)
+            if reply is not None:
+                result.direct_render = True
+                return self._local_reply(result, started, reply, on_text, on_message)
+
+            message, _ = self._complete(result, started, on_text, on_message, run_tools=False)
+
+            if message["content"] is not None:
+                self.messages.append({"role": "assistant", "content": message["content"]})
+        elif message["content"] is not None:
+            self.messages.append({"role": "assistant", "content": message["content"]})
+        else:
+            raise ValueError("No response from OpenAI API")
+
+        result.reply = message["content"]
+        result.total_ms = (time.perf_counter() - started) * 1000
+        return result
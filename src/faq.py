@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Tuple
+import re
+import threading
+import unicodedata
+
+# Messages with these words are about a concrete booking and always go to the model
+BOOKING_WORDS = (
+    "rezerv", "termin", "slobod", "dostup", "datum", "sutra", "danas", "tjedan", "ponud",
+    "sudionik", "osoba", "ljudi", "mjesta",
+)
+DATE_OR_TIME = re.compile(r"\d{1,2}[.:/-]\d{1,2}")
+# Someone giving their contact details is answering the booking flow, not asking a question
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+PHONE = re.compile(r"\+?\d(?:[\s/-]?\d){5,}")
+# Only questions get a canned answer; "Ne treba mi parking" is a statement
+QUESTION_WORDS = re.compile(
+    r"\b(koliko|gdje|kada|kad|kako|koje|koji|koja|sto|sta|ima li|imate li|je li|da li|"
+    r"mogu li|moze li|mozete li|radite li|postoji li)\b"
+)
+
+SPACE_KEYWORDS = {
+    "Konferencijska dvorana": ("dvoran", "konferencij"),
+    "Sala za sastanke": ("sala", "sale", "salu", "sastan"),
+    "Flydesk": ("flydesk", "fly desk", "radno mjesto", "radna mjesta", "coworking mjesto"),
+    "Uredi": ("ured",),
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip diacritics, so 'Košta' matches 'kosta'."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).replace("đ", "d")
+
+
+def parse_sections(prompt: str) -> Dict[str, List[str]]:
+    """Split the system prompt into {section title: non-empty lines}."""
+    sections = {}
+    current = None
+    for line in prompt.splitlines():
+        if line.startswith("# "):
+            current = line[2:].strip()
+            sections[current] = []
+        elif current and line.strip():
+            sections[current].append(line.strip())
+    return sections
+
+
+class FaqMatcher:
+    """
+    Answers static questions (hours, contact, address, parking, prices) locally.
+
+    Answers are precomputed from the structured sections of the system prompt.
+    A message is answered only if it is phrased as a question, exactly one topic
+    matches, it is short and it does not look like part of a booking (dates,
+    booking words, an e-mail address or a phone number); everything else falls
+    through to the model.
+    """
+
+    def __init__(self, prompt: str, threshold: float = 0.8):
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._intents = self._build_intents(parse_sections(prompt))
+
+    @staticmethod
+    def _build_intents(sections: Dict[str, List[str]]) -> List[Tuple[str, Tuple[str, ...], Dict[str, str]]]:
+        """Return [(intent, keywords, {space or '': answer})]."""
+        info = dict(line.split(":", 1) for line in sections.get("Info", []) if ":" in line)
+        info = {key.strip(): value.strip() for key, value in info.items()}
+
+        intents = []
+        if "Radno vrijeme" in info:
+            intents.append((
+                "hours",
+                ("radno vrijeme", "radite", "otvoren", "do kada", "od kada", "zatvara"),
+                {"": f"Radno vrijeme je {info['Radno vrijeme']}."},
+            ))
+        if "Kontakt" in info:
+            intents.append((
+                "contact",
+                ("kontakt", "telefon", "broj telefona", "broj mobitela", "email", "e-mail", "mail", "nazvati"),
+                {"": f"Možete nas kontaktirati na {info['Kontakt']}."},
+            ))
+        if "Adresa" in info:
+            intents.append((
+                "address",
+                ("adres", "gdje se nalazi", "gdje ste", "lokacij", "kako doci"),
+                {"": f"Nalazimo se na adresi {info['Adresa']}."},
+            ))
+        if any("parking" in line.lower() for line in sections.get("Ograničenja", [])):
+            intents.append((
+                "parking",
+                ("parking", "parkira", "parkiral"),
+                {"": "Coworking Pula ne osigurava parking, ali u blizini postoji više javnih "
+                     "parkirališta koja su prikazana na slici."},
+            ))
+
+        # "Konferencijska dvorana (150€/h, 560€/dan):" and "- Ured 06 (16.8m², 3 mjesta): 294€"
+        prices = {}
+        offices = []
+        for line in sections.get("Prostori i cijene", []):
+            header = re.match(r"^([^-(][^(]*?)\s*\((.+)\)\s*:?$", line)
+            if header and not line.startswith("-"):
+                prices[header.group(1).strip()] = header.group(2).strip()
+            elif re.match(r"^- Ured", line) and "€" in line:
+                offices.append(line[2:])
+        if offices:
+            prices["Uredi"] = "mjesečno, " + "; ".join(offices)
+        if prices:
+            answers = {space: f"{space}: {price}." for space, price in prices.items()}
+            answers[""] = "Cijene: " + " ".join(answers.values())
+            intents.append(("prices", ("cijen", "kosta", "cjenik", "koliko se placa", "najam kosta"), answers))
+
+        return [
+            (intent, tuple(normalize(keyword) for keyword in keywords), answers)
+            for intent, keywords, answers in intents
+        ]
+
+    def _score(self, question: str) -> Tuple[Optional[str], float]:
+        if EMAIL.search(question) or PHONE.search(question):
+            return None, 0.0
+        text = normalize(question)
+        if any(word in text for word in BOOKING_WORDS) or DATE_OR_TIME.search(text):
+            return None, 0.0
+        if "?" not in text and not QUESTION_WORDS.search(text):
+            return None, 0.0
+
+        matched = [
+            (intent, answers)
+            for intent, keywords, answers in self._intents
+            if any(keyword in text for keyword in keywords)
+        ]
+        if not matched:
+            return None, 0.0
+
+        intent, answers = matched[0]
+        answer = answers[""]
+        if intent == "prices":
+            spaces = [space for space, keywords in SPACE_KEYWORDS.items() if any(k in text for k in keywords)]
+            spaces = [space for space in spaces if space in answers]
+            if len(spaces) == 1:
+                answer = answers[spaces[0]]
+
+        words = len(re.findall(r"\w+", text))
+        confidence = 1.0 if words <= 8 else 0.85 if words <= 14 else 0.5
+        if len(matched) > 1:
+            confidence *= 0.5  # several topics in one message; let the model combine them
+        return answer, confidence
+
+    def match(self, question: str) -> Optional[str]:
+        """Return a local answer if the question is a confident FAQ match, else None."""
+        answer, confidence = self._score(question)
+        hit = answer is not None and confidence >= self.threshold
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return answer if hit else None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
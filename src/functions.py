@@ -3,4 +3,14 @@ from enum import Enum
 class ChatFunctions(Enum):
     COLLECT_CONTACT = "collect_contact"
     CHECK_AVAILABILITY = "check_availability"
-    GET_AVAILABLE_SLOTS = "get_available_slots"
\ No newline at end of file
+    GET_AVAILABLE_SLOTS = "get_available_slots"
+    FIND_FREE_WINDOWS = "find_free_windows"
+    FIND_EARLIEST_SLOTS = "find_earliest_slots"
+
+# Functions without side effects; these may run concurrently within one turn
+READ_ONLY_FUNCTIONS = frozenset({
+    ChatFunctions.CHECK_AVAILABILITY.value,
+    ChatFunctions.GET_AVAILABLE_SLOTS.value,
+    ChatFunctions.FIND_FREE_WINDOWS.value,
+    ChatFunctions.FIND_EARLIEST_SLOTS.value,
+})
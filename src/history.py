@@ -0,0 +1,126 @@
+from typing import Dict, List
+import json
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Upper bound on the length of the summary that replaces dropped turns
+SUMMARY_MAX_CHARS = 600
+
+
+def _as_dict(message) -> Dict:
+    """Messages may be plain dicts or ChatCompletionMessage objects."""
+    if isinstance(message, dict):
+        return message
+    return message.model_dump(exclude_none=True)
+
+
+def estimate_tokens(message) -> int:
+    """
+    Estimate the prompt tokens used by one message.
+
+    Uses ~4 characters per token, which is close enough for budgeting;
+    exact counts are reported by the API in `usage.prompt_tokens`.
+    """
+    message = _as_dict(message)
+    size = len(message.get("content") or "")
+    if message.get("tool_calls"):
+        size += len(json.dumps(message["tool_calls"], ensure_ascii=False))
+    return size // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class HistoryManager:
+    """
+    Builds the message list sent to the model from the full conversation,
+    keeping it within a token budget.
+
+    The system prompt and the latest turns are always kept, and an assistant
+    message with tool calls is never separated from its tool results. Tool
+    results from earlier turns are shortened, and when the budget is still
+    exceeded the oldest turns are replaced by a short summary of what the
+    user asked in them.
+    """
+
+    def __init__(self, max_tokens: int = 8000, keep_recent_turns: int = 2, stale_tool_chars: int = 200):
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.stale_tool_chars = stale_tool_chars
+        self.last_prompt_tokens = 0
+        self.last_dropped_turns = 0
+
+    @staticmethod
+    def _split_turns(messages: List[Dict]) -> List[List[Dict]]:
+        """Group messages into turns, each starting with a user message."""
+        turns = [[]]
+        for message in messages:
+            if message["role"] == "user" and turns[-1]:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _collapse_tool_results(self, turn: List[Dict]) -> List[Dict]:
+        collapsed = []
+        for message in turn:
+            content = message.get("content") or ""
+            if message["role"] == "tool" and len(content) > self.stale_tool_chars:
+                message = {**message, "content": content[:self.stale_tool_chars] + "…"}
+            collapsed.append(message)
+        return collapsed
+
+    @staticmethod
+    def _summarize(turns: List[List[Dict]]) -> Dict:
+        requests = [
+            message["content"][:100]
+            for turn in turns
+            for message in turn
+            if message["role"] == "user" and message.get("content")
+        ]
+        summary = " | ".join(requests)
+        if len(summary) > SUMMARY_MAX_CHARS:
+            summary = "…" + summary[-SUMMARY_MAX_CHARS:]  # the latest requests matter most
+        return {
+            "role": "system",
+            "content": "Sažetak ranijeg dijela razgovora, korisnik je napisao: " + summary,
+        }
+
+    def build(self, messages: List) -> List[Dict]:
+        """
+        Return the messages to send for the next completion.
+
+        Args:
+            messages: Full conversation, starting with the system prompt
+
+        Returns:
+            list: Trimmed copy of the conversation; `messages` is not modified
+        """
+        messages = [_as_dict(message) for message in messages]
+        system, rest = messages[:1], messages[1:]
+        turns = self._split_turns(rest) if rest else []
+
+        recent_start = max(len(turns) - self.keep_recent_turns, 0)
+        old_turns = [self._collapse_tool_results(turn) for turn in turns[:recent_start]]
+        recent_turns = turns[recent_start:]
+
+        budget = self.max_tokens - sum(estimate_tokens(m) for m in system)
+        budget -= sum(estimate_tokens(m) for turn in recent_turns for m in turn)
+        if old_turns:
+            budget -= SUMMARY_MAX_CHARS // 4 + MESSAGE_OVERHEAD_TOKENS  # room for a possible summary
+
+        # Keep as many of the old turns as fit, newest first
+        kept = []
+        for turn in reversed(old_turns):
+            cost = sum(estimate_tokens(m) for m in turn)
+            if cost > budget:
+                break
+            kept.insert(0, turn)
+            budget -= cost
+        dropped = old_turns[:len(old_turns) - len(kept)]
+
+        result = list(system)
+        if dropped:
+            result.append(self._summarize(dropped))
+        for turn in kept + recent_turns:
+            result.extend(turn)
+
+        self.last_dropped_turns = len(dropped)
+        self.last_prompt_tokens = sum(estimate_tokens(m) for m in result)
+        return result
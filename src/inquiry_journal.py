@@ -0,0 +1,180 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends still notice a compacted journal, but without locking
+    fcntl = None
+
+
+def iter_inquiries(path: str = "inquiries.jsonl") -> Iterator[Dict]:
+    """
+    Stream inquiries from a JSONL journal one record at a time.
+
+    Lines that cannot be decoded (e.g. a record torn by a crash mid-write)
+    are skipped with a warning instead of failing the whole read.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping malformed inquiry at {path}:{line_number}")
+
+
+class InquiryJournal:
+    """
+    Append-only JSONL journal of inquiries.
+
+    Every append is a single line written and flushed to the OS, so its cost
+    does not depend on how many inquiries are already stored. fsync is batched:
+    it runs once `fsync_every` records are pending or `fsync_interval` seconds
+    have passed since the last one, whichever comes first.
+
+    `compact` may run in another process while the app is appending: appends
+    hold a shared lock on `<journal>.lock` and compaction an exclusive one, and
+    a writer reopens the journal when it finds the file was swapped under it.
+    """
+
+    def __init__(self, path: str = "inquiries.jsonl", fsync_every: int = 10, fsync_interval: float = 5.0):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock shared between processes: shared for appends, exclusive for compaction."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open(self):
+        if self._file is not None:
+            # Reopen if the journal was compacted (replaced) by someone else
+            try:
+                replaced = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if replaced:
+                self._fsync()
+                self._file.close()
+                self._file = None
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def _fsync(self):
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def append(self, inquiry: Dict):
+        """Append one inquiry as a JSON line."""
+        line = json.dumps(inquiry, ensure_ascii=False) + "\n"
+        with self._lock, self._file_lock(exclusive=False):
+            f = self._open()
+            f.write(line)
+            f.flush()
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+
+    def flush(self):
+        """Force pending records to disk."""
+        with self._lock:
+            self._fsync()
+
+    def close(self):
+        with self._lock:
+            self._fsync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __iter__(self) -> Iterator[Dict]:
+        self.flush()
+        return iter_inquiries(self.path)
+
+    def compact(self, legacy_path: Optional[str] = None) -> int:
+        """
+        Rewrite the journal without malformed lines and duplicate records.
+
+        If `legacy_path` points to an old inquiries.json array, its records are
+        folded in ahead of the journal. The new file is written next to the
+        journal and swapped in atomically, so a crash leaves the old one intact.
+        Appends from other processes wait until the swap is done and then go to
+        the new file.
+
+        Returns:
+            int: Number of records in the compacted journal
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self._fsync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            records = []
+            if legacy_path and Path(legacy_path).exists():
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    records.extend(json.load(f))
+            records.extend(iter_inquiries(self.path))
+
+            seen = set()
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    line = json.dumps(record, ensure_ascii=False)
+                    if line in seen:
+                        continue
+                    seen.add(line)
+                    f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            if legacy_path and Path(legacy_path).exists():
+                Path(legacy_path).rename(Path(legacy_path).with_suffix(".json.migrated"))
+
+            return len(seen)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back office tools for the inquiry journal")
+    parser.add_argument("command", choices=["list", "compact"])
+    parser.add_argument("--journal", default="inquiries.jsonl")
+    parser.add_argument("--legacy", default="inquiries.json", help="Old inquiries.json to fold in on compact")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for inquiry in iter_inquiries(args.journal):
+            print(json.dumps(inquiry, ensure_ascii=False))
+    else:
+        count = InquiryJournal(args.journal).compact(args.legacy)
+        print(f"Compacted {args.journal}: {count} inquiries")
@@ -0,0 +1,230 @@
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+import json
+import logging
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+
+from metrics import span
+
+
+def format_inquiry(inquiry: Dict) -> str:
+    """One inquiry as readable text for staff."""
+    lines = [
+        f"Vrijeme: {inquiry.get('timestamp')}",
+        f"Ime: {inquiry.get('name')}",
+        f"Kontakt ({inquiry.get('contact_type')}): {inquiry.get('contact_value')}",
+        f"Prostor: {inquiry.get('space_type')}",
+    ]
+    for key, value in (inquiry.get("requirements") or {}).items():
+        lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+class Notifier:
+    """Tells staff about new inquiries. `send` gets a batch and raises on failure."""
+
+    name = "notifier"
+
+    def send(self, inquiries: List[Dict]):
+        raise NotImplementedError
+
+
+class LogNotifier(Notifier):
+    """Local stand-in: writes the notification to the log."""
+
+    name = "log"
+
+    def send(self, inquiries: List[Dict]):
+        for inquiry in inquiries:
+            logging.info("=== New Inquiry Received ===\n" + format_inquiry(inquiry))
+
+
+class SmtpNotifier(Notifier):
+    """Sends one e-mail per batch of inquiries."""
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str,
+        sender: str,
+        recipients: Sequence[str],
+        port: int = 587,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send(self, inquiries: List[Dict]):
+        message = EmailMessage()
+        message["Subject"] = (
+            f"Novi upit: {inquiries[0].get('name')}" if len(inquiries) == 1 else f"Novi upiti ({len(inquiries)})"
+        )
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content("\n\n".join(format_inquiry(inquiry) for inquiry in inquiries))
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message)
+
+
+class WebhookNotifier(Notifier):
+    """POSTs {"inquiries": [...]} as JSON, e.g. to a Slack/Teams relay or the back office."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, inquiries: List[Dict]):
+        body = json.dumps({"inquiries": inquiries}, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def notifiers_from_config(config: Mapping) -> List[Notifier]:
+    """
+    Build the notifiers configured in `config` (e.g. st.secrets).
+
+    NOTIFY_SMTP_HOST with NOTIFY_EMAIL_FROM/NOTIFY_EMAIL_TO enables e-mail,
+    NOTIFY_WEBHOOK_URL a webhook; without either, notifications go to the log.
+    """
+    notifiers = []
+    if config.get("NOTIFY_SMTP_HOST"):
+        recipients = config.get("NOTIFY_EMAIL_TO", [])
+        if isinstance(recipients, str):
+            recipients = [address.strip() for address in recipients.split(",") if address.strip()]
+        notifiers.append(SmtpNotifier(
+            config["NOTIFY_SMTP_HOST"],
+            config["NOTIFY_EMAIL_FROM"],
+            recipients,
+            port=config.get("NOTIFY_SMTP_PORT", 587),
+            username=config.get("NOTIFY_SMTP_USER"),
+            password=config.get("NOTIFY_SMTP_PASSWORD"),
+            starttls=config.get("NOTIFY_SMTP_STARTTLS", True),
+        ))
+    if config.get("NOTIFY_WEBHOOK_URL"):
+        notifiers.append(WebhookNotifier(config["NOTIFY_WEBHOOK_URL"]))
+    return notifiers or [LogNotifier()]
+
+
+class InquiryWorker:
+    """
+    Background thread that persists inquiries and notifies staff.
+
+    `submit` only puts the inquiry on a queue, so the conversation turn does not
+    wait for the disk or the network. The worker takes up to `batch_size`
+    inquiries at a time (waiting at most `batch_wait` seconds for more), stores
+    each one, then hands the batch to every notifier. Failed steps are retried
+    with exponential backoff; what still fails is logged with the full
+    inquiry, so nothing is lost silently.
+    """
+
+    def __init__(
+        self,
+        persist: Callable[[Dict], None],
+        notifiers: Sequence[Notifier] = (),
+        batch_size: int = 20,
+        batch_wait: float = 1.0,
+        max_retries: int = 5,
+        retry_delay: float = 1.0,
+    ):
+        self.persist = persist
+        self.notifiers = list(notifiers)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inquiry-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, inquiry: Dict):
+        """Queue an inquiry; returns immediately."""
+        self._queue.put(inquiry)
+
+    def flush(self):
+        """Block until every submitted inquiry has been processed."""
+        self._queue.join()
+
+    def close(self):
+        """Process what is queued, then stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self) -> List[Optional[Dict]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _retry(self, description: str, action: Callable[[], None]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                action()
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logging.error(f"{description} failed after {attempt + 1} attempts: {e}")
+                    return False
+                logging.warning(f"{description} failed, retrying: {e}")
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _process(self, inquiries: List[Dict]):
+        stored = []
+        for inquiry in inquiries:
+            if self._retry("Saving inquiry", lambda: self.persist(inquiry)):
+                stored.append(inquiry)
+            else:
+                logging.error("Unsaved inquiry: " + json.dumps(inquiry, ensure_ascii=False))
+        logging.info(f"Saved {len(stored)} of {len(inquiries)} inquiries")
+
+        for notifier in self.notifiers:
+            with span("notification_seconds", notifier=notifier.name):
+                sent = self._retry(f"{notifier.name} notification", lambda: notifier.send(inquiries))
+            if not sent:
+                logging.error(
+                    f"Staff not notified via {notifier.name}: "
+                    + json.dumps(inquiries, ensure_ascii=False)
+                )
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            inquiries = [inquiry for inquiry in batch if inquiry is not None]
+            try:
+                if inquiries:
+                    self._process(inquiries)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(inquiries) < len(batch):
+                return  # close() was called
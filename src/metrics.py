@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds in seconds, from fast local lookups to slow model responses
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    "openai_request_seconds": "OpenAI chat completion latency by phase (queue, ttft, total)",
+    "tool_call_seconds": "Duration of handle_function_call by function",
+    "storage_io_seconds": "Duration of calendar and inquiry file/database I/O by operation",
+    "notification_seconds": "Duration of sending a batch of inquiry notifications to staff, including retries",
+    "chat_turn_seconds": "Duration of a user turn by how it was answered (model, faq, direct_render)",
+    "streamlit_rerun_seconds": "Duration of a full Streamlit script rerun",
+    "streamlit_fragment_seconds": "Duration of a chat fragment rerun, which draws only the new turns",
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as in the Prometheus data model."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls into."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Process-wide collection of labelled latency histograms."""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Time the enclosed block and record it, also if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def summary(self) -> List[Dict]:
+        """Rows for display: metric, labels, count, mean and estimated p50/p95 in ms."""
+        with self._lock:
+            return [
+                {
+                    "metric": name,
+                    "labels": ", ".join(f"{k}={v}" for k, v in labels),
+                    "count": histogram.count,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 2),
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+
+    def export_text(self) -> str:
+        """Render all histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self._histograms})
+            for name in names:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                    prefix = label_text + "," if label_text else ""
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+                    suffix = f"{{{label_text}}}" if label_text else ""
+                    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+                    lines.append(f"{name}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Write the metrics for node_exporter's textfile collector, replacing the file atomically."""
+        path = Path(path)
+        # Sessions write concurrently, so each writer needs its own temp file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(self.export_text(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve GET /metrics from a background thread."""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.export_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = MetricsRegistry()
+
+
+def observe(name: str, seconds: float, **labels):
+    METRICS.observe(name, seconds, **labels)
+
+
+def span(name: str, **labels):
+    return METRICS.span(name, **labels)
+
+
+def start_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    return METRICS.serve(port, host)
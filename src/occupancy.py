@@ -0,0 +1,130 @@
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from calendar_index import WORK_START, WORK_END, to_time_str
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = (WORK_END - WORK_START) // SLOT_MINUTES
+
+
+def _to_slot(minutes: np.ndarray, round_up: bool) -> np.ndarray:
+    """Map minute offsets to slot numbers within working hours."""
+    offsets = np.clip(minutes - WORK_START, 0, WORK_END - WORK_START)
+    if round_up:
+        return -(-offsets // SLOT_MINUTES)
+    return offsets // SLOT_MINUTES
+
+
+class OccupancyEngine:
+    """
+    Answers range queries over many days and spaces at once.
+
+    Each space/day is a row of a boolean bitmap with one bit per 15 minutes of
+    the 08:00-22:00 window. Bookings that cover part of a slot mark the whole
+    slot as busy, so reported windows are always safe to book.
+    """
+
+    def __init__(self, calendar):
+        # Anything with `space_type in calendar` and `calendar.day(space_type, date)`,
+        # i.e. a CalendarIndex or a storage backend
+        self._calendar = calendar
+
+    def occupancy(self, rows: List[tuple], now: Optional[datetime] = None) -> np.ndarray:
+        """
+        Build the occupancy bitmap for the given (space_type, date) rows.
+
+        Args:
+            rows: List of (space_type, date_str) pairs
+            now: Slots before this moment are treated as busy
+
+        Returns:
+            np.ndarray: Boolean array of shape (len(rows), SLOTS_PER_DAY)
+        """
+        row_ids, starts, ends = [], [], []
+        for row_id, (space_type, date) in enumerate(rows):
+            if space_type not in self._calendar:
+                continue
+            day = self._calendar.day(space_type, date)
+            row_ids.extend([row_id] * len(day))
+            starts.extend(day.starts)
+            ends.extend(day.ends)
+
+        # Mark +1 at each booking start and -1 at its end, then a running sum
+        # gives the number of bookings covering each slot
+        changes = np.zeros((len(rows), SLOTS_PER_DAY + 1), dtype=np.int32)
+        if row_ids:
+            row_ids = np.asarray(row_ids)
+            start_slots = _to_slot(np.asarray(starts), round_up=False)
+            end_slots = _to_slot(np.asarray(ends), round_up=True)
+            valid = end_slots > start_slots
+            np.add.at(changes, (row_ids[valid], start_slots[valid]), 1)
+            np.add.at(changes, (row_ids[valid], end_slots[valid]), -1)
+        busy = np.cumsum(changes, axis=1)[:, :SLOTS_PER_DAY] > 0
+
+        if now is not None:
+            today = now.strftime("%Y-%m-%d")
+            elapsed = np.asarray([now.hour * 60 + now.minute])
+            past_slots = int(_to_slot(elapsed, round_up=True)[0])
+            dates = np.asarray([date for _, date in rows])
+            busy[dates < today] = True
+            busy[dates == today, :past_slots] = True
+        return busy
+
+    def find_free_windows(
+        self,
+        spaces: List[str],
+        start_date: str,
+        days: int,
+        duration_minutes: int,
+        from_time: int = WORK_START,
+        to_time: int = WORK_END,
+        now: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """
+        Find free windows of at least `duration_minutes` in every space and day.
+
+        Args:
+            spaces: Space types to search
+            start_date: First date in YYYY-MM-DD format
+            days: Number of consecutive days to search
+            duration_minutes: Minimum length of a window
+            from_time: Earliest start, minutes since midnight
+            to_time: Latest end, minutes since midnight
+            now: Windows in the past are excluded
+
+        Returns:
+            list: Maximal free windows as dicts with space_type, date, start and end,
+                ordered by date, then space, then start time
+        """
+        first = date_type.fromisoformat(start_date)
+        dates = [(first + timedelta(days=offset)).isoformat() for offset in range(days)]
+        rows = [(space_type, date) for date in dates for space_type in spaces]
+        if not rows:
+            return []
+
+        busy = self.occupancy(rows, now)
+        # Restrict the search to the requested part of the day
+        lower = int(_to_slot(np.asarray([from_time]), round_up=True)[0])
+        upper = int(_to_slot(np.asarray([to_time]), round_up=False)[0])
+        busy[:, :lower] = True
+        busy[:, upper:] = True
+
+        # Runs of free slots: +1 where a run starts, -1 just past where it ends
+        free = np.pad(~busy, ((0, 0), (1, 1))).astype(np.int8)
+        edges = np.diff(free, axis=1)
+        run_rows, run_starts = np.nonzero(edges == 1)
+        _, run_ends = np.nonzero(edges == -1)
+        needed = -(-duration_minutes // SLOT_MINUTES)
+        long_enough = (run_ends - run_starts) >= max(needed, 1)
+
+        return [
+            {
+                "space_type": rows[row][0],
+                "date": rows[row][1],
+                "start": to_time_str(WORK_START + start * SLOT_MINUTES),
+                "end": to_time_str(WORK_START + end * SLOT_MINUTES),
+            }
+            for row, start, end in zip(run_rows[long_enough], run_starts[long_enough], run_ends[long_enough])
+        ]
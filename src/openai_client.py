@@ -0,0 +1,295 @@
+from types import SimpleNamespace
+from typing import Dict, Optional
+import hashlib
+import json
+import random
+import threading
+import time
+
+from openai import APIConnectionError, APIStatusError, OpenAI
+
+from metrics import observe
+
+
+class ServiceUnavailableError(Exception):
+    """Raised without calling the API: the circuit breaker is open or too many requests are waiting."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated API failures instead of letting every request time out.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests are rejected for `reset_timeout` seconds. Then a single trial
+    request is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def cancel_trial(self):
+        """Give up a trial that never reached the API, so the next request may try."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    if isinstance(error, APIConnectionError):  # includes APITimeoutError
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+class _Flight:
+    """Result of an in-flight request that identical requests wait for."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._response = None
+        self._error: Optional[BaseException] = None
+
+    def resolve(self, response):
+        self._response = response
+        self._done.set()
+
+    def fail(self, error: BaseException):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+
+class _SlotStream:
+    """
+    A streamed response that holds one concurrency slot until it is closed.
+
+    The slot is freed when the stream is exhausted, fails, is closed, or is
+    garbage collected without ever being iterated.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._release = release
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            # StopIteration included: the stream is done either way
+            self.close()
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()  # returns the HTTP connection to the pool
+        finally:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class ResilientClient:
+    """
+    OpenAI client wrapper shared by all sessions of the server process.
+
+    Exposes `chat.completions.create` like the OpenAI client, so the engine
+    uses it unchanged, and adds:
+    - a concurrency limiter: at most `max_concurrency` requests (including
+      open streams) are in flight; others wait up to `queue_timeout` seconds
+    - retries with exponential backoff and full jitter on 429, 5xx, timeouts
+      and connection errors, honouring Retry-After
+    - a circuit breaker that rejects requests during an outage
+    - coalescing of identical non-streamed requests that are in flight at the
+      same time, so they cost one API call
+
+    Retries happen before a stream has produced anything; a stream that fails
+    midway is not repeated, as its tokens have already been shown.
+    """
+
+    def __init__(
+        self,
+        client: OpenAI,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        max_concurrency: int = 8,
+        queue_timeout: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client = client
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight: Dict[str, "_Flight"] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0, "coalesced": 0}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_chat_completion))
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, circuit=self.breaker.state)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.backoff_max)
+        except ValueError:
+            pass  # an HTTP date; fall back to our own backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count("rejected")
+            raise ServiceUnavailableError("Too many concurrent OpenAI requests")
+        observe("openai_request_seconds", time.perf_counter() - started, phase="limiter")
+
+    def _call(self, **kwargs):
+        """Call the API with retries; returns with a concurrency slot held."""
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise ServiceUnavailableError("OpenAI API is unavailable, requests are paused")
+            try:
+                self._acquire()
+            except ServiceUnavailableError:
+                # Checked after the breaker so that an outage is rejected without queueing
+                self.breaker.cancel_trial()
+                raise
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                self._slots.release()
+                if not is_retryable(e):
+                    # The API answered, so it is up; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff(attempt, e))
+                continue
+            self.breaker.record_success()
+            return response
+
+    def create_chat_completion(self, **kwargs):
+        self._count("requests")
+        if kwargs.get("stream"):
+            return _SlotStream(self._call(**kwargs), self._slots.release)
+
+        key = hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return flight.wait()
+
+        try:
+            response = self._call(**kwargs)
+            self._slots.release()
+            flight.resolve(response)
+            return response
+        except BaseException as e:
+            flight.fail(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+def create_client(
+    api_key: str,
+    base_url: Optional[str] = None,
+    timeout: float = 60.0,
+    max_retries: int = 3,
+    max_concurrency: int = 8,
+    failure_threshold: int = 5,
+    reset_timeout: float = 30.0,
+) -> ResilientClient:
+    """
+    Build the process-wide client.
+
+    The underlying OpenAI client keeps a pool of keep-alive connections, so
+    it is created once and shared; its own retries are turned off in favour
+    of ours.
+    """
+    client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+    return ResilientClient(
+        client,
+        max_retries=max_retries,
+        max_concurrency=max_concurrency,
+        breaker=CircuitBreaker(failure_threshold, reset_timeout),
+    )
@@ -0,0 +1,387 @@
+"""
+Recurring bookings stored as rules and expanded only for the dates that are queried.
+
+A weekly meeting is one rule ("dvorana, Mondays 09:00-11:00 from 2026-11-02")
+instead of one calendar entry per week, so the rules file and its memory use
+grow with the number of rules, not with the number of occurrences.
+`RecurringStorage` wraps any storage backend and adds the occurrences to the
+days it returns, so availability checks, free slots, range searches and
+bookings all see them.
+
+Rules live in recurring.json and can be managed from the command line:
+
+    python src/recurrence.py add dvorana 2026-11-02 09:00 11:00 --weekly --until 2027-06-30 --title "Kolegij"
+    python src/recurrence.py skip 1 2026-12-28
+    python src/recurrence.py list
+    python src/recurrence.py remove 1
+"""
+from dataclasses import dataclass, field, replace
+from datetime import date as date_type, timedelta
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import threading
+
+from calendar_index import WORK_START, WORK_END, DayIndex, to_minutes, to_time_str
+from storage import JsonStorage, PartitionedStorage, SqliteStorage, Storage
+
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+FREQUENCIES = (WEEKLY, MONTHLY)
+
+
+def _months_between(first: date_type, day: date_type) -> int:
+    return (day.year - first.year) * 12 + day.month - first.month
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    """
+    A booking that repeats every `interval` weeks or months.
+
+    Weekly rules fall on the weekday of `first_date`, monthly rules on its day of
+    the month (months without that day, e.g. the 31st, are skipped). Times are
+    minutes since midnight; `until` is the last date that can have an occurrence.
+    """
+
+    space_type: str
+    first_date: date_type
+    start: int
+    end: int
+    frequency: str = WEEKLY
+    interval: int = 1
+    until: Optional[date_type] = None
+    exceptions: FrozenSet[date_type] = field(default_factory=frozenset)
+    title: str = ""
+    rule_id: int = 0
+
+    def __post_init__(self):
+        if self.frequency not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency: {self.frequency}")
+        if self.interval < 1:
+            raise ValueError("Interval must be at least 1")
+        if not WORK_START <= self.start < self.end <= WORK_END:
+            raise ValueError("Recurring bookings must lie within working hours (8-22h)")
+        if self.until is not None and self.until < self.first_date:
+            raise ValueError("End date is before the first date")
+
+    def occurs_on(self, day: date_type) -> bool:
+        """Constant-time check whether the rule has an occurrence on `day`."""
+        if day < self.first_date or (self.until is not None and day > self.until) or day in self.exceptions:
+            return False
+        if self.frequency == WEEKLY:
+            return (day - self.first_date).days % (7 * self.interval) == 0
+        return day.day == self.first_date.day and _months_between(self.first_date, day) % self.interval == 0
+
+    def occurrences(self, start: date_type, end: date_type) -> Iterator[date_type]:
+        """Yield the dates of the occurrences in [start, end), in order."""
+        last = end - timedelta(days=1)
+        if self.until is not None:
+            last = min(last, self.until)
+        start = max(start, self.first_date)
+
+        if self.frequency == WEEKLY:
+            step = 7 * self.interval
+            # Jump straight to the first occurrence on or after `start`
+            day = self.first_date + timedelta(days=-(-(start - self.first_date).days // step) * step)
+            while day <= last:
+                if day not in self.exceptions:
+                    yield day
+                day += timedelta(days=step)
+            return
+
+        months = -(-_months_between(self.first_date, start) // self.interval) * self.interval
+        while True:
+            year, month = divmod(self.first_date.month - 1 + months, 12)
+            months += self.interval
+            try:
+                day = self.first_date.replace(year=self.first_date.year + year, month=month + 1)
+            except ValueError:
+                continue  # e.g. the 31st in a 30-day month
+            if day > last:
+                return
+            if day >= start and day not in self.exceptions:
+                yield day
+
+    def to_json(self) -> Dict:
+        return {
+            "id": self.rule_id,
+            "space_type": self.space_type,
+            "frequency": self.frequency,
+            "interval": self.interval,
+            "first_date": self.first_date.isoformat(),
+            "until": self.until.isoformat() if self.until else None,
+            "start_time": to_time_str(self.start),
+            "end_time": to_time_str(self.end),
+            "exceptions": sorted(day.isoformat() for day in self.exceptions),
+            "title": self.title,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "RecurrenceRule":
+        return cls(
+            space_type=data["space_type"],
+            first_date=date_type.fromisoformat(data["first_date"]),
+            start=to_minutes(data["start_time"]),
+            end=to_minutes(data["end_time"]),
+            frequency=data.get("frequency", WEEKLY),
+            interval=data.get("interval", 1),
+            until=date_type.fromisoformat(data["until"]) if data.get("until") else None,
+            exceptions=frozenset(date_type.fromisoformat(day) for day in data.get("exceptions", [])),
+            title=data.get("title", ""),
+            rule_id=data.get("id", 0),
+        )
+
+
+class RecurrenceStore:
+    """
+    The recurrence rules, kept in a small JSON file.
+
+    Like JsonStorage, the file is re-read only when its mtime or size changes,
+    so rules edited by the CLI are picked up by a running server.
+    """
+
+    def __init__(self, path: str = "recurring.json"):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._rules: Dict[int, RecurrenceRule] = {}
+        self._by_space: Dict[str, List[RecurrenceRule]] = {}
+        # Bumped on every load or change of the rules
+        self._version = 0
+        self._load()
+
+    def _file_stamp(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        stamp = self._file_stamp()
+        rules = []
+        if stamp is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rules = [RecurrenceRule.from_json(rule) for rule in json.load(f)["rules"]]
+        self._set_rules(rules)
+        self._stamp = stamp
+
+    def _set_rules(self, rules: Iterable[RecurrenceRule]):
+        self._rules = {rule.rule_id: rule for rule in rules}
+        self._by_space = {}
+        for rule in self._rules.values():
+            self._by_space.setdefault(rule.space_type, []).append(rule)
+        self._version += 1
+
+    def _reload_if_changed(self):
+        with self._lock:
+            if self._file_stamp() != self._stamp:
+                logging.info(f"{self.path} changed on disk, reloading")
+                self._load()
+
+    def _save(self):
+        """Write all rules atomically."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"rules": [rule.to_json() for rule in self.rules()]}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._file_stamp()
+
+    def _update(self, rules: Iterable[RecurrenceRule]):
+        self._set_rules(rules)
+        self._save()
+
+    def version(self) -> int:
+        self._reload_if_changed()
+        return self._version
+
+    def has_space(self, space_type: str) -> bool:
+        self._reload_if_changed()
+        return space_type in self._by_space
+
+    def rules(self) -> List[RecurrenceRule]:
+        with self._lock:
+            return sorted(self._rules.values(), key=lambda rule: rule.rule_id)
+
+    def add(self, rule: RecurrenceRule) -> RecurrenceRule:
+        """Store a new rule and return it with its assigned id."""
+        with self._lock:
+            self._reload_if_changed()
+            rule = replace(rule, rule_id=max(self._rules, default=0) + 1)
+            self._update([*self._rules.values(), rule])
+        return rule
+
+    def remove(self, rule_id: int) -> bool:
+        with self._lock:
+            self._reload_if_changed()
+            if rule_id not in self._rules:
+                return False
+            self._update(rule for rule in self._rules.values() if rule.rule_id != rule_id)
+        return True
+
+    def skip(self, rule_id: int, day: date_type) -> bool:
+        """Cancel a single occurrence of a rule."""
+        with self._lock:
+            self._reload_if_changed()
+            rule = self._rules.get(rule_id)
+            if rule is None:
+                return False
+            skipped = replace(rule, exceptions=rule.exceptions | {day})
+            self._update(skipped if other.rule_id == rule_id else other for other in self._rules.values())
+        return True
+
+    def intervals(self, space_type: str, date: str) -> Iterator[Tuple[int, int]]:
+        """Yield the (start, end) minutes of the occurrences of `space_type` on `date`."""
+        self._reload_if_changed()
+        rules = self._by_space.get(space_type)
+        if not rules:
+            return
+        day = date_type.fromisoformat(date)
+        for rule in rules:
+            if rule.occurs_on(day):
+                yield rule.start, rule.end
+
+
+class RecurringStorage(Storage):
+    """
+    Storage wrapper that overlays recurring bookings on the wrapped backend.
+
+    Occurrences are computed from the rules when a day is read and are never
+    written to the backend. `book` refuses slots taken by an occurrence, and
+    `version` includes the rules version, so cached availability results are
+    invalidated when a rule changes. `iter_days` (used by the export) yields
+    only the stored one-off bookings, as open-ended rules have no last day.
+    """
+
+    def __init__(self, base: Storage, rules: RecurrenceStore):
+        self.base = base
+        self.rules = rules
+
+    def __contains__(self, space_type: str) -> bool:
+        return space_type in self.base or self.rules.has_space(space_type)
+
+    def day(self, space_type: str, date: str) -> DayIndex:
+        day = self.base.day(space_type, date)
+        recurring = list(self.rules.intervals(space_type, date))
+        if not recurring:
+            return day
+        # A new index, so the backend's cached day is left untouched
+        return DayIndex.from_minutes(list(zip(day.starts, day.ends)) + recurring)
+
+    def iter_days(self) -> Iterator[Tuple[str, str, DayIndex]]:
+        return self.base.iter_days()
+
+    def set_days(self, days: Iterable[Tuple[str, str, list]]):
+        self.base.set_days(days)
+
+    def book(self, space_type: str, date: str, start: int, end: int) -> bool:
+        return self.add_bookings([(space_type, date, start, end)])[0]
+
+    def add_bookings(self, bookings: Iterable[Tuple[str, str, int, int]]) -> List[bool]:
+        bookings = list(bookings)
+        free = [
+            not any(start < rule_end and rule_start < end for rule_start, rule_end in self.rules.intervals(space_type, date))
+            for space_type, date, start, end in bookings
+        ]
+        stored = iter(self.base.add_bookings([booking for booking, ok in zip(bookings, free) if ok]))
+        return [ok and next(stored) for ok in free]
+
+    def version(self, space_type: str, date: str) -> tuple:
+        return self.base.version(space_type, date) + (self.rules.version(),)
+
+    def append_inquiry(self, inquiry: Dict):
+        self.base.append_inquiry(inquiry)
+
+    def iter_inquiries(self) -> Iterator[Dict]:
+        return self.base.iter_inquiries()
+
+
+def find_conflicts(storage: Storage, rule: RecurrenceRule, start: date_type, end: date_type) -> Iterator[date_type]:
+    """Yield the dates in [start, end) on which an occurrence of `rule` overlaps a stored booking."""
+    for day in rule.occurrences(start, end):
+        if rule.space_type in storage and storage.day(rule.space_type, day.isoformat()).overlaps(rule.start, rule.end):
+            yield day
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage recurring bookings")
+    parser.add_argument("--rules", default="recurring.json", help="Rules file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add a recurring booking")
+    add.add_argument("space_type", choices=["dvorana", "sala_za_sastanke"])
+    add.add_argument("first_date", help="First occurrence, YYYY-MM-DD")
+    add.add_argument("start_time", help="HH:MM")
+    add.add_argument("end_time", help="HH:MM")
+    frequency = add.add_mutually_exclusive_group()
+    frequency.add_argument("--weekly", dest="frequency", action="store_const", const=WEEKLY)
+    frequency.add_argument("--monthly", dest="frequency", action="store_const", const=MONTHLY)
+    add.add_argument("--interval", type=int, default=1, help="Every N weeks or months")
+    add.add_argument("--until", help="Last possible date, YYYY-MM-DD")
+    add.add_argument("--except", dest="exceptions", action="append", default=[], help="Date to skip, YYYY-MM-DD")
+    add.add_argument("--title", default="")
+    add.add_argument("--calendar", default="calendar.json", help="JSON calendar to check for conflicts")
+    add.add_argument("--sqlite", help="Check this SQLite database instead of the JSON calendar")
+    add.add_argument("--partitioned", help="Check this month-partitioned calendar directory instead")
+    add.add_argument("--horizon", type=int, default=365, help="Days ahead to check for conflicts")
+
+    skip = commands.add_parser("skip", help="Cancel one occurrence")
+    skip.add_argument("rule_id", type=int)
+    skip.add_argument("date", help="YYYY-MM-DD")
+
+    remove = commands.add_parser("remove", help="Delete a rule")
+    remove.add_argument("rule_id", type=int)
+
+    commands.add_parser("list", help="Show all rules")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = RecurrenceStore(args.rules)
+
+    if args.command == "add":
+        rule = RecurrenceRule(
+            space_type=args.space_type,
+            first_date=date_type.fromisoformat(args.first_date),
+            start=to_minutes(args.start_time),
+            end=to_minutes(args.end_time),
+            frequency=args.frequency or WEEKLY,
+            interval=args.interval,
+            until=date_type.fromisoformat(args.until) if args.until else None,
+            exceptions=frozenset(date_type.fromisoformat(day) for day in args.exceptions),
+            title=args.title,
+        )
+        if args.sqlite:
+            storage = SqliteStorage(args.sqlite)
+        elif args.partitioned:
+            storage = PartitionedStorage(args.partitioned)
+        else:
+            storage = JsonStorage(calendar_path=args.calendar)
+        start = max(rule.first_date, date_type.today())
+        conflicts = list(find_conflicts(storage, rule, start, start + timedelta(days=args.horizon)))
+        rule = store.add(rule)
+        print(f"Added rule {rule.rule_id}")
+        if conflicts:
+            print(f"Overlaps existing bookings on {len(conflicts)} dates (skip them with `skip {rule.rule_id} DATE`):")
+            for day in conflicts:
+                print(f"  {day.isoformat()}")
+    elif args.command == "skip":
+        if not store.skip(args.rule_id, date_type.fromisoformat(args.date)):
+            parser.error(f"No rule {args.rule_id}")
+    elif args.command == "remove":
+        if not store.remove(args.rule_id):
+            parser.error(f"No rule {args.rule_id}")
+    else:
+        for rule in store.rules():
+            every = f"every {rule.interval} " if rule.interval > 1 else "every "
+            unit = ("weeks" if rule.interval > 1 else "week") if rule.frequency == WEEKLY else ("months" if rule.interval > 1 else "month")
+            until = f" until {rule.until.isoformat()}" if rule.until else ""
+            print(
+                f"{rule.rule_id}: {rule.space_type} {to_time_str(rule.start)}-{to_time_str(rule.end)} "
+                f"{every}{unit} from {rule.first_date.isoformat()}{until}"
+                + (f", skipping {len(rule.exceptions)} dates" if rule.exceptions else "")
+                + (f" ({rule.title})" if rule.title else "")
+            )
@@ -0,0 +1,50 @@
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+ASSETS_DIR = Path(__file__).parent / "assets"
+
+LOGO_WIDTH = 200
+# st.image without a width fills the chat column, which is at most ~700px wide
+PARKING_WIDTH = 700
+# Images are kept at twice their CSS width so they stay sharp on high-DPI screens
+PIXEL_RATIO = 2
+
+
+@lru_cache(maxsize=None)
+def load_image(name: str, display_width: int, quality: int = 85) -> bytes:
+    """
+    Read an image from src/assets once and return it resized for its display width.
+
+    The result is cached for the lifetime of the process, so reruns and
+    repeated messages reuse the same bytes instead of reading the file again.
+    Images are re-encoded as JPEG, which is much smaller than PNG for the
+    photos and maps we show.
+
+    Args:
+        name: File name inside src/assets
+        display_width: Width the image is shown at, in CSS pixels
+        quality: JPEG quality of the re-encoded image
+
+    Returns:
+        bytes: Encoded image, never wider than the original
+    """
+    with Image.open(ASSETS_DIR / name) as image:
+        image = image.convert("RGB")
+        target_width = display_width * PIXEL_RATIO
+        if image.width > target_width:
+            height = round(image.height * target_width / image.width)
+            image = image.resize((target_width, height), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def logo() -> bytes:
+    return load_image("ida_logo.jpg", LOGO_WIDTH)
+
+
+def parking_map() -> bytes:
+    return load_image("parking.png", PARKING_WIDTH)
@@ -0,0 +1,558 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from calendar_index import CalendarIndex, DayIndex, to_minutes
+from inquiry_journal import InquiryJournal, iter_inquiries
+from metrics import span
+
+BOOKABLE_SPACES = ("dvorana", "sala_za_sastanke")
+
+
+class Storage:
+    """
+    Interface of the calendar and inquiry storage backends used by DataManager.
+
+    Times are passed as minutes since midnight, dates as YYYY-MM-DD strings.
+    """
+
+    def __contains__(self, space_type: str) -> bool:
+        raise NotImplementedError
+
+    def day(self, space_type: str, date: str) -> DayIndex:
+        """Return the bookings of a space on a date."""
+        raise NotImplementedError
+
+    def iter_days(self) -> Iterator[Tuple[str, str, DayIndex]]:
+        """Yield (space_type, date, bookings) for every day with bookings, ordered by space and date."""
+        raise NotImplementedError
+
+    def set_days(self, days: Iterable[Tuple[str, str, list]]):
+        """Replace the bookings of each (space_type, date, [(start_time, end_time)])."""
+        raise NotImplementedError
+
+    def book(self, space_type: str, date: str, start: int, end: int) -> bool:
+        """Add a booking unless it overlaps an existing one. Returns False on conflict."""
+        raise NotImplementedError
+
+    def add_bookings(self, bookings: Iterable[Tuple[str, str, int, int]]) -> List[bool]:
+        """
+        Add many (space_type, date, start, end) bookings in one write, skipping those that
+        overlap a stored or earlier one. Returns one flag per booking, False on conflict.
+        """
+        raise NotImplementedError
+
+    def version(self, space_type: str, date: str) -> tuple:
+        """Return a value that changes whenever the bookings of a space on a date change."""
+        raise NotImplementedError
+
+    def append_inquiry(self, inquiry: Dict):
+        raise NotImplementedError
+
+    def iter_inquiries(self) -> Iterator[Dict]:
+        raise NotImplementedError
+
+
+class JsonStorage(Storage):
+    """
+    Development backend: calendar.json plus the inquiries.jsonl journal.
+
+    The calendar is held in memory and re-read only when the file's mtime or
+    size changes. Bookings are conflict-checked within this process only.
+    """
+
+    def __init__(self, json_path: str = "inquiries.jsonl", calendar_path: str = "calendar.json"):
+        self.json_path = Path(json_path)
+        self.calendar_path = Path(calendar_path)
+        # Inquiries are only appended, never read back on the request path
+        self._inquiries = InquiryJournal(self.json_path)
+        # One instance is shared by all sessions of the server process
+        self._lock = threading.RLock()
+        self._calendar_stamp = None
+        # Bumped on every (re)load, which may change any day
+        self._epoch = 0
+        self._day_versions = {}  # {(space_type, date): int}
+        self._load_calendar()
+
+    def _file_stamp(self):
+        """Return (mtime, size) of the calendar file, or None if it is missing."""
+        try:
+            stat = self.calendar_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_calendar(self):
+        """Load calendar data from JSON file."""
+        calendar = {
+            "dvorana": {},  # {date_str: [(start_time, end_time)]}
+            "sala_za_sastanke": {}
+        }
+        with span("storage_io_seconds", operation="calendar_load"):
+            stamp = self._file_stamp()
+            if stamp is not None:
+                with open(self.calendar_path, 'r', encoding='utf-8') as f:
+                    calendar = json.load(f)
+
+            # Booking strings are parsed once here; queries work on minute offsets
+            self._calendar = CalendarIndex(calendar)
+        self._calendar_stamp = stamp
+        self._epoch += 1
+
+    def _reload_if_changed(self):
+        """Re-read the calendar only if the file was changed by someone else."""
+        with self._lock:
+            if self._file_stamp() != self._calendar_stamp:
+                logging.info(f"{self.calendar_path} changed on disk, reloading")
+                self._load_calendar()
+
+    def _save_calendar(self):
+        """Save calendar data to JSON file, atomically, so readers never see a half-written file."""
+        with self._lock, span("storage_io_seconds", operation="calendar_save"):
+            # Per-process name, as the import CLI may save at the same time as the app
+            tmp_path = self.calendar_path.with_name(f"{self.calendar_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._calendar.to_json(), f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.calendar_path)
+            self._calendar_stamp = self._file_stamp()
+
+    def __contains__(self, space_type: str) -> bool:
+        self._reload_if_changed()
+        return space_type in self._calendar
+
+    def day(self, space_type: str, date: str) -> DayIndex:
+        self._reload_if_changed()
+        return self._calendar.day(space_type, date)
+
+    def iter_days(self) -> Iterator[Tuple[str, str, DayIndex]]:
+        with self._lock:
+            self._reload_if_changed()
+            days = list(self._calendar.iter_days())
+        for space_type, date, day in days:
+            if len(day):
+                yield space_type, date, day
+
+    def set_days(self, days: Iterable[Tuple[str, str, list]]):
+        with self._lock:
+            self._reload_if_changed()
+            for space_type, date, bookings in days:
+                self._calendar.set_day(space_type, date, bookings)
+                self._bump(space_type, date)
+            self._save_calendar()
+
+    def book(self, space_type: str, date: str, start: int, end: int) -> bool:
+        return self.add_bookings([(space_type, date, start, end)])[0]
+
+    def add_bookings(self, bookings: Iterable[Tuple[str, str, int, int]]) -> List[bool]:
+        added = []
+        with self._lock:
+            self._reload_if_changed()
+            for space_type, date, start, end in bookings:
+                ok = not self._calendar.day(space_type, date).overlaps(start, end)
+                if ok:
+                    self._calendar.add_booking(space_type, date, start, end)
+                    self._bump(space_type, date)
+                added.append(ok)
+            if any(added):
+                self._save_calendar()
+        return added
+
+    def _bump(self, space_type: str, date: str):
+        key = (space_type, date)
+        self._day_versions[key] = self._day_versions.get(key, 0) + 1
+
+    def version(self, space_type: str, date: str) -> tuple:
+        self._reload_if_changed()
+        return (self._epoch, self._day_versions.get((space_type, date), 0))
+
+    def append_inquiry(self, inquiry: Dict):
+        with span("storage_io_seconds", operation="inquiry_append"):
+            self._inquiries.append(inquiry)
+
+    def iter_inquiries(self) -> Iterator[Dict]:
+        self._inquiries.flush()
+        return iter_inquiries(self.json_path)
+
+
+class SqliteStorage(Storage):
+    """
+    SQLite backend in WAL mode, safe to share between processes.
+
+    Bookings are rows indexed on (space_type, date, start_minute, end_minute),
+    so a day is read with a single index range scan. `book` checks for
+    conflicts and inserts in one write transaction, so concurrent sessions
+    cannot both book the same slot.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY,
+            space_type TEXT NOT NULL,
+            date TEXT NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS bookings_slot
+            ON bookings (space_type, date, start_minute, end_minute);
+        CREATE TABLE IF NOT EXISTS calendar_versions (
+            space_type TEXT NOT NULL,
+            date TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (space_type, date)
+        );
+        CREATE TABLE IF NOT EXISTS inquiries (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str = "reservations.db", timeout: float = 5.0):
+        self.db_path = str(db_path)
+        self.timeout = timeout
+        # sqlite3 connections must not be shared between threads
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode; write transactions are opened explicitly below
+            connection = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _write_transaction(self):
+        """Write transaction that takes the database write lock up front."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def __contains__(self, space_type: str) -> bool:
+        return space_type in BOOKABLE_SPACES
+
+    def day(self, space_type: str, date: str) -> DayIndex:
+        with span("storage_io_seconds", operation="day_read"):
+            rows = self._connection().execute(
+                "SELECT start_minute, end_minute FROM bookings WHERE space_type = ? AND date = ?",
+                (space_type, date),
+            )
+            return DayIndex.from_minutes(rows)
+
+    def iter_days(self) -> Iterator[Tuple[str, str, DayIndex]]:
+        # The cursor walks the bookings_slot index, so days arrive grouped and sorted
+        rows = self._connection().execute(
+            "SELECT space_type, date, start_minute, end_minute FROM bookings "
+            "ORDER BY space_type, date, start_minute, end_minute"
+        )
+        for (space_type, date), day_rows in groupby(rows, key=lambda row: (row[0], row[1])):
+            yield space_type, date, DayIndex.from_minutes((start, end) for _, _, start, end in day_rows)
+
+    def set_days(self, days: Iterable[Tuple[str, str, list]]):
+        with span("storage_io_seconds", operation="calendar_save"), self._write_transaction() as connection:
+            for space_type, date, bookings in days:
+                connection.execute("DELETE FROM bookings WHERE space_type = ? AND date = ?", (space_type, date))
+                connection.executemany(
+                    "INSERT INTO bookings (space_type, date, start_minute, end_minute) VALUES (?, ?, ?, ?)",
+                    [(space_type, date, to_minutes(start), to_minutes(end)) for start, end in bookings],
+                )
+                self._bump(connection, space_type, date)
+
+    def book(self, space_type: str, date: str, start: int, end: int) -> bool:
+        return self.add_bookings([(space_type, date, start, end)])[0]
+
+    def add_bookings(self, bookings: Iterable[Tuple[str, str, int, int]]) -> List[bool]:
+        added = []
+        with span("storage_io_seconds", operation="book"), self._write_transaction() as connection:
+            for space_type, date, start, end in bookings:
+                ok = connection.execute(
+                    "SELECT 1 FROM bookings WHERE space_type = ? AND date = ? "
+                    "AND start_minute < ? AND end_minute > ? LIMIT 1",
+                    (space_type, date, end, start),
+                ).fetchone() is None
+                if ok:
+                    connection.execute(
+                        "INSERT INTO bookings (space_type, date, start_minute, end_minute) VALUES (?, ?, ?, ?)",
+                        (space_type, date, start, end),
+                    )
+                    self._bump(connection, space_type, date)
+                added.append(ok)
+        return added
+
+    @staticmethod
+    def _bump(connection: sqlite3.Connection, space_type: str, date: str):
+        """Increase the version of a day; part of the caller's write transaction."""
+        connection.execute(
+            "INSERT INTO calendar_versions (space_type, date, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (space_type, date) DO UPDATE SET version = version + 1",
+            (space_type, date),
+        )
+
+    def version(self, space_type: str, date: str) -> tuple:
+        # Stored in the database, so writes by other processes are seen too
+        row = self._connection().execute(
+            "SELECT version FROM calendar_versions WHERE space_type = ? AND date = ?",
+            (space_type, date),
+        ).fetchone()
+        return (row[0] if row else 0,)
+
+    def append_inquiry(self, inquiry: Dict):
+        with span("storage_io_seconds", operation="inquiry_append"), self._write_transaction() as connection:
+            connection.execute(
+                "INSERT INTO inquiries (timestamp, data) VALUES (?, ?)",
+                (inquiry["timestamp"], json.dumps(inquiry, ensure_ascii=False)),
+            )
+
+    def iter_inquiries(self) -> Iterator[Dict]:
+        for (data,) in self._connection().execute("SELECT data FROM inquiries ORDER BY id"):
+            yield json.loads(data)
+
+
+class PartitionedStorage(Storage):
+    """
+    Calendar split into one file per space and month, loaded only when a query touches it.
+
+    Layout: `root/<space_type>/<YYYY-MM>.json` for the current and future months,
+    `<YYYY-MM>.json.gz` for past months, which are only read for history. Each file
+    holds {date: [[start_minute, end_minute], ...]}. At most `max_partitions` months
+    are kept in memory (least recently used ones are dropped), and a write rewrites
+    only the months it changed, so startup and save cost do not grow with the
+    number of stored years.
+
+    Changes made by other processes are picked up when a month is next read,
+    but bookings are conflict-checked within this process only: two processes
+    writing the same month at the same time can overwrite each other's bookings.
+    Use SqliteStorage for several writers.
+    """
+
+    def __init__(
+        self,
+        root: str = "calendar",
+        json_path: str = "inquiries.jsonl",
+        max_partitions: int = 48,
+        legacy_calendar_path: Optional[str] = "calendar.json",
+    ):
+        self.root = Path(root)
+        self.json_path = Path(json_path)
+        self.max_partitions = max_partitions
+        self._inquiries = InquiryJournal(self.json_path)
+        self._lock = threading.RLock()
+        # {(space_type, month): (file stamp, {date: DayIndex})}, in LRU order
+        self._partitions: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        # Bumped on every load of a partition, which may change any of its days
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._day_versions: Dict[Tuple[str, str], int] = {}
+
+        if not self.root.exists() and legacy_calendar_path and Path(legacy_calendar_path).exists():
+            self._migrate(Path(legacy_calendar_path))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.archive()
+
+    @staticmethod
+    def _current_month() -> str:
+        return datetime.now().strftime("%Y-%m")
+
+    def _paths(self, space_type: str, month: str) -> Tuple[Path, Path]:
+        """(preferred, other) file of a partition; past months are stored gzipped."""
+        plain = self.root / space_type / f"{month}.json"
+        packed = plain.with_name(plain.name + ".gz")
+        return (packed, plain) if month < self._current_month() else (plain, packed)
+
+    @staticmethod
+    def _file_stamp(path: Path):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (path.name, stat.st_mtime_ns, stat.st_size)
+
+    def _locate(self, space_type: str, month: str) -> Tuple[Path, Optional[tuple]]:
+        """Return the file holding a partition and its stamp (None if the month is empty)."""
+        preferred, other = self._paths(space_type, month)
+        stamp = self._file_stamp(preferred)
+        if stamp is None:
+            # A month that ended since the last archive() is still uncompressed
+            other_stamp = self._file_stamp(other)
+            if other_stamp is not None:
+                return other, other_stamp
+        return preferred, stamp
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, DayIndex]:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            days = json.load(f)
+        return {date: DayIndex.from_minutes(map(tuple, intervals)) for date, intervals in days.items()}
+
+    @staticmethod
+    def _write(path: Path, days: Dict[str, DayIndex]):
+        """Replace a partition file atomically, so readers never see a half-written month."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(
+            {date: [list(pair) for pair in zip(day.starts, day.ends)] for date, day in sorted(days.items()) if len(day)},
+            separators=(",", ":"),
+        )
+        # Per-process name, as the import CLI may write a month while the app does
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _partition(
+        self, space_type: str, month: str, dirty: Optional[Dict[Tuple[str, str], Dict[str, DayIndex]]] = None
+    ) -> Dict[str, DayIndex]:
+        """
+        Return the days of one month, loading it if needed or if the file changed on disk.
+
+        Months in `dirty` (changed but not saved yet) are returned as they are and
+        are never evicted, so a batch cannot lose its own unsaved writes.
+        """
+        key = (space_type, month)
+        if dirty and key in dirty:
+            return dirty[key]
+        path, stamp = self._locate(space_type, month)
+        cached = self._partitions.get(key)
+        if cached is not None and cached[0] == stamp:
+            self._partitions.move_to_end(key)
+            return cached[1]
+
+        with span("storage_io_seconds", operation="partition_load"):
+            days = self._read(path) if stamp is not None else {}
+        self._partitions[key] = (stamp, days)
+        self._partitions.move_to_end(key)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        if len(self._partitions) > self.max_partitions:
+            for old_key in list(self._partitions):
+                if len(self._partitions) <= self.max_partitions:
+                    break
+                if not dirty or old_key not in dirty:
+                    del self._partitions[old_key]
+        return days
+
+    def _save(self, dirty: Dict[Tuple[str, str], Dict[str, DayIndex]]):
+        """Write the changed partitions, also if the LRU has dropped them meanwhile."""
+        with span("storage_io_seconds", operation="partition_save"):
+            for (space_type, month), days in dirty.items():
+                path, other = self._paths(space_type, month)
+                self._write(path, days)
+                if other.exists():
+                    other.unlink()
+                if (space_type, month) in self._partitions:
+                    self._partitions[(space_type, month)] = (self._file_stamp(path), days)
+        dirty.clear()
+
+    def _migrate(self, calendar_path: Path):
+        """Split an existing calendar.json into partitions."""
+        logging.info(f"Partitioning {calendar_path} into {self.root}")
+        with open(calendar_path, "r", encoding="utf-8") as f:
+            calendar = json.load(f)
+        for space_type, dates in calendar.items():
+            months: Dict[str, Dict[str, DayIndex]] = {}
+            for date, bookings in dates.items():
+                months.setdefault(date[:7], {})[date] = DayIndex(bookings)
+            for month, days in months.items():
+                self._write(self._paths(space_type, month)[0], days)
+            if not dates:
+                (self.root / space_type).mkdir(parents=True, exist_ok=True)
+
+    def archive(self) -> int:
+        """Compress the partitions of months that have ended. Returns how many were archived."""
+        current = self._current_month()
+        archived = 0
+        with self._lock:
+            for path in sorted(self.root.glob("*/*.json")):
+                month = path.name[:-len(".json")]
+                if month >= current:
+                    continue
+                self._write(path.with_name(path.name + ".gz"), self._read(path))
+                path.unlink()
+                archived += 1
+        if archived:
+            logging.info(f"Archived {archived} past calendar months in {self.root}")
+        return archived
+
+    def __contains__(self, space_type: str) -> bool:
+        return space_type in BOOKABLE_SPACES or (self.root / space_type).is_dir()
+
+    def day(self, space_type: str, date: str) -> DayIndex:
+        with self._lock:
+            return self._partition(space_type, date[:7]).get(date) or DayIndex()
+
+    def iter_days(self) -> Iterator[Tuple[str, str, DayIndex]]:
+        for space_dir in sorted(path for path in self.root.iterdir() if path.is_dir()):
+            months = sorted({path.name.split(".")[0] for path in space_dir.glob("*.json*") if not path.name.endswith(".tmp")})
+            for month in months:
+                with self._lock:
+                    days = dict(self._partition(space_dir.name, month))
+                for date in sorted(days):
+                    if len(days[date]):
+                        yield space_dir.name, date, days[date]
+
+    def set_days(self, days: Iterable[Tuple[str, str, list]]):
+        with self._lock:
+            dirty = {}
+            for space_type, date, bookings in days:
+                partition = self._partition(space_type, date[:7], dirty)
+                partition[date] = DayIndex(bookings)
+                self._bump(space_type, date)
+                dirty[(space_type, date[:7])] = partition
+                if len(dirty) >= self.max_partitions:
+                    self._save(dirty)  # keeps memory bounded for large imports
+            self._save(dirty)
+
+    def book(self, space_type: str, date: str, start: int, end: int) -> bool:
+        return self.add_bookings([(space_type, date, start, end)])[0]
+
+    def add_bookings(self, bookings: Iterable[Tuple[str, str, int, int]]) -> List[bool]:
+        added = []
+        with self._lock:
+            dirty = {}
+            for space_type, date, start, end in bookings:
+                partition = self._partition(space_type, date[:7], dirty)
+                day = partition.get(date)
+                ok = day is None or not day.overlaps(start, end)
+                if ok:
+                    partition.setdefault(date, DayIndex()).add(start, end)
+                    self._bump(space_type, date)
+                    dirty[(space_type, date[:7])] = partition
+                    if len(dirty) >= self.max_partitions:
+                        self._save(dirty)
+                added.append(ok)
+            self._save(dirty)
+        return added
+
+    def _bump(self, space_type: str, date: str):
+        key = (space_type, date)
+        self._day_versions[key] = self._day_versions.get(key, 0) + 1
+
+    def version(self, space_type: str, date: str) -> tuple:
+        with self._lock:
+            # Loading the partition picks up changes made by other processes
+            self._partition(space_type, date[:7])
+            return (self._generations[(space_type, date[:7])], self._day_versions.get((space_type, date), 0))
+
+    def append_inquiry(self, inquiry: Dict):
+        with span("storage_io_seconds", operation="inquiry_append"):
+            self._inquiries.append(inquiry)
+
+    def iter_inquiries(self) -> Iterator[Dict]:
+        self._inquiries.flush()
+        return iter_inquiries(self.json_path)
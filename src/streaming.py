@@ -0,0 +1,132 @@
+from typing import Callable, Dict, Iterable, Iterator, Optional
+import time
+
+from metrics import observe, span
+
+
+def _tool_call_to_dict(tool_call) -> Dict:
+    return {
+        "id": tool_call.id,
+        "type": "function",
+        "function": {
+            "name": tool_call.function.name,
+            "arguments": tool_call.function.arguments,
+        },
+    }
+
+
+def collect_stream(
+    stream: Iterable,
+    on_text: Optional[Callable[[str], None]] = None,
+    on_tool_call: Optional[Callable[[Dict], None]] = None,
+    on_usage: Optional[Callable] = None,
+) -> Dict:
+    """
+    Consume a streamed chat completion and assemble the assistant message.
+
+    Args:
+        stream: Chunks returned by `chat.completions.create(..., stream=True)`
+        on_text: Called with every content token as soon as it arrives
+        on_tool_call: Called with each tool call as soon as its arguments are
+            complete, i.e. when the stream moves on to the next call or ends
+        on_usage: Called with the token usage if the stream reports it
+
+    Returns:
+        dict: Assistant message with `content` and, if any, `tool_calls`
+    """
+    content = []
+    tool_calls = {}  # {index: tool_call_dict}
+    current_index = None
+
+    for chunk in stream:
+        if getattr(chunk, "usage", None) and on_usage:
+            on_usage(chunk.usage)
+        if not chunk.choices:
+            continue  # e.g. the trailing usage chunk
+        delta = chunk.choices[0].delta
+
+        if delta.content:
+            content.append(delta.content)
+            if on_text:
+                on_text(delta.content)
+
+        for tool_call_delta in delta.tool_calls or []:
+            index = tool_call_delta.index
+            if index != current_index:
+                # Deltas arrive call by call, so a new index closes the previous call
+                if current_index is not None and on_tool_call:
+                    on_tool_call(tool_calls[current_index])
+                current_index = index
+                tool_calls[index] = {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                }
+
+            tool_call = tool_calls[index]
+            if tool_call_delta.id:
+                tool_call["id"] = tool_call_delta.id
+            if tool_call_delta.function:
+                if tool_call_delta.function.name:
+                    tool_call["function"]["name"] += tool_call_delta.function.name
+                if tool_call_delta.function.arguments:
+                    tool_call["function"]["arguments"] += tool_call_delta.function.arguments
+
+    if current_index is not None and on_tool_call:
+        on_tool_call(tool_calls[current_index])
+
+    message = {"role": "assistant", "content": "".join(content) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    return message
+
+
+def _observe_first_token(chunks: Iterable, started: float) -> Iterator:
+    """Pass chunks through, recording the time to the first content or tool call delta."""
+    first = True
+    for chunk in chunks:
+        if first and chunk.choices and (chunk.choices[0].delta.content or chunk.choices[0].delta.tool_calls):
+            observe("openai_request_seconds", time.perf_counter() - started, phase="ttft", stream="true")
+            first = False
+        yield chunk
+
+
+def create_completion(
+    client,
+    stream: bool = True,
+    on_text: Optional[Callable[[str], None]] = None,
+    on_tool_call: Optional[Callable[[Dict], None]] = None,
+    on_usage: Optional[Callable] = None,
+    **kwargs,
+) -> Dict:
+    """
+    Request a chat completion and return the assistant message as a dict.
+
+    With `stream=True` tokens and tool calls are handed to the callbacks while
+    the response is still being generated; otherwise the callbacks are called
+    once the full response has arrived, so callers handle both modes the same way.
+    """
+    started = time.perf_counter()
+    if stream:
+        if on_usage:
+            kwargs["stream_options"] = {"include_usage": True}
+        with span("openai_request_seconds", phase="total", stream="true"):
+            chunks = client.chat.completions.create(stream=True, **kwargs)
+            # Until the response headers arrive: time spent queued and processing the prompt
+            observe("openai_request_seconds", time.perf_counter() - started, phase="queue", stream="true")
+            return collect_stream(_observe_first_token(chunks, started), on_text, on_tool_call, on_usage)
+
+    with span("openai_request_seconds", phase="total", stream="false"):
+        response = client.chat.completions.create(**kwargs)
+    if response.usage and on_usage:
+        on_usage(response.usage)
+    response_message = response.choices[0].message
+    message = {"role": "assistant", "content": response_message.content}
+    if response_message.content and on_text:
+        on_text(response_message.content)
+    if response_message.tool_calls:
+        message["tool_calls"] = [_tool_call_to_dict(tool_call) for tool_call in response_message.tool_calls]
+        if on_tool_call:
+            for tool_call in message["tool_calls"]:
+                on_tool_call(tool_call)
+    return message
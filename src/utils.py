@@ -173,5 +173,85 @@ def get_available_tools() -> list:
                     "additionalProperties": False,
                 }
             }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": ChatFunctions.FIND_FREE_WINDOWS.value,
+                "description": "Finds free time windows of a minimum duration across several days and spaces in one call",
+                "strict": True,
+                "parameters": {
+                    "type": "object",
+                    "required": ["space_type", "start_date", "days", "duration_minutes", "from_time", "to_time"],
+                    "properties": {
+                        "space_type": {
+                            "type": "string",
+                            "description": "Type of space to search, or 'svi' for all bookable spaces",
+                            "enum": ["dvorana", "sala_za_sastanke", "svi"],
+                        },
+                        "start_date": {
+                            "type": "string",
+                            "description": "First date to search in YYYY-MM-DD format",
+                        },
+                        "days": {
+                            "type": "integer",
+                            "description": "Number of consecutive days to search",
+                        },
+                        "duration_minutes": {
+                            "type": "integer",
+                            "description": "Minimum length of the free window in minutes",
+                        },
+                        "from_time": {
+                            "type": "string",
+                            "description": "Earliest start time in HH:MM format (08:00 for the whole day)",
+                        },
+                        "to_time": {
+                            "type": "string",
+                            "description": "Latest end time in HH:MM format (22:00 for the whole day)",
+                        }
+                    },
+                    "additionalProperties": False,
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": ChatFunctions.FIND_EARLIEST_SLOTS.value,
+                "description": "Finds the earliest free time slots of a given duration from a date onwards, searching forward day by day",
+                "strict": True,
+                "parameters": {
+                    "type": "object",
+                    "required": ["space_type", "start_date", "duration_minutes", "count", "from_time", "to_time"],
+                    "properties": {
+                        "space_type": {
+                            "type": "string",
+                            "description": "Type of space to search, or 'svi' for all bookable spaces",
+                            "enum": ["dvorana", "sala_za_sastanke", "svi"],
+                        },
+                        "start_date": {
+                            "type": "string",
+                            "description": "Date to start searching from in YYYY-MM-DD format",
+                        },
+                        "duration_minutes": {
+                            "type": "integer",
+                            "description": "Required length of the slot in minutes",
+                        },
+                        "count": {
+                            "type": "integer",
+                            "description": "Number of slots to return (1-10, usually 3)",
+                        },
+                        "from_time": {
+                            "type": "string",
+                            "description": "Earliest start time in HH:MM format (08:00 for the whole day)",
+                        },
+                        "to_time": {
+                            "type": "string",
+                            "description": "Latest end time in HH:MM format (22:00 for the whole day)",
+                        }
+                    },
+                    "additionalProperties": False,
+                }
+            }
         }
     ]
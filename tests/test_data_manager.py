@@ -0,0 +1,14 @@
+from data_manager import SLOT_AVAILABLE, DataManager
+from storage import JsonStorage
+
+
+def make_manager(tmp_path) -> DataManager:
+    return DataManager(storage=JsonStorage(tmp_path / "inquiries.jsonl", tmp_path / "calendar.json"))
+
+
+def test_inverted_or_empty_range_is_rejected(tmp_path):
+    manager = make_manager(tmp_path)
+    for start, end in [("12:00", "10:00"), ("10:00", "10:00")]:
+        assert manager.book("dvorana", "2099-05-04", start, end) == "Završetak termina mora biti nakon njegova početka."
+        assert manager.check_availability("dvorana", "2099-05-04", start, end) != SLOT_AVAILABLE
+    assert manager.get_available_slots("dvorana", "2099-05-04") == [("08:00", "22:00")]
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import pytest
+
+from faq import FaqMatcher
+from utils import prepare_prompt
+
+PROMPT_PATH = Path(__file__).resolve().parent.parent / "src" / "prompts" / "system_message.txt"
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return FaqMatcher(prepare_prompt(str(PROMPT_PATH), date="2026-10-18"))
+
+
+@pytest.mark.parametrize("message", [
+    "Moj email je ana@gmail.com",
+    "Ivan Horvat, broj 0911234567",
+    "Javite se na telefon 091 555 1234",
+    "Moj broj je +385 91 555 1234",
+    "Ne treba mi parking",
+    "Kontakt: ana@gmail.com",
+    "Koji je broj ureda?",
+    "Na kojem je broju kata dvorana?",
+])
+def test_contact_details_and_statements_go_to_the_model(matcher, message):
+    assert matcher.match(message) is None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Koje je radno vrijeme?", "Radno vrijeme"),
+    ("Gdje se nalazite?", "adresi"),
+    ("Ima li parkinga", "parking"),
+    ("Koliko košta dvorana?", "Konferencijska dvorana"),
+    ("Koji je vaš kontakt?", "kontaktirati"),
+    ("Koji je vaš broj telefona?", "kontaktirati"),
+])
+def test_questions_are_answered_locally(matcher, message, expected):
+    assert expected in matcher.match(message)
+
+
+def test_booking_questions_go_to_the_model(matcher):
+    assert matcher.match("Koliko košta dvorana 12.11. od 10:00?") is None
+    assert matcher.match("Je li dvorana slobodna sutra?") is None
@@ -0,0 +1,46 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai import APIConnectionError
+
+from openai_client import CircuitBreaker, ResilientClient, ServiceUnavailableError
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.down = False
+
+    def create(self, **kwargs):
+        if self.down:
+            raise APIConnectionError(request=None)
+        return "ok"
+
+
+def test_trial_that_cannot_get_a_slot_does_not_block_the_circuit():
+    completions = FakeCompletions()
+    client = ResilientClient(
+        SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        max_retries=0,
+        max_concurrency=1,
+        queue_timeout=0.01,
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05),
+    )
+
+    completions.down = True
+    with pytest.raises(APIConnectionError):
+        client.chat.completions.create(messages=[{"role": "user", "content": "a"}])
+    assert client.breaker.state == "open"
+    completions.down = False
+    time.sleep(0.06)
+
+    # Hold the only slot, as an open stream would, so the trial times out in the queue
+    client._slots.acquire()
+    try:
+        with pytest.raises(ServiceUnavailableError):
+            client.chat.completions.create(messages=[{"role": "user", "content": "b"}])
+    finally:
+        client._slots.release()
+
+    assert client.chat.completions.create(messages=[{"role": "user", "content": "c"}]) == "ok"
+    assert client.breaker.state == "closed"
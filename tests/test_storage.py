@@ -0,0 +1,22 @@
+from storage import PartitionedStorage
+
+
+def test_partitioned_batch_keeps_unsaved_months_when_cache_is_full(tmp_path):
+    root = tmp_path / "calendar"
+    PartitionedStorage(root, tmp_path / "inquiries.jsonl", legacy_calendar_path=None).set_days([
+        ("dvorana", "2027-02-05", [("10:00", "11:00")]),
+        ("dvorana", "2027-03-05", [("10:00", "11:00")]),
+    ])
+
+    storage = PartitionedStorage(root, tmp_path / "inquiries.jsonl", max_partitions=2, legacy_calendar_path=None)
+    added = storage.add_bookings([
+        ("dvorana", "2027-01-05", 600, 660),
+        ("dvorana", "2027-02-05", 600, 660),  # conflict
+        ("dvorana", "2027-03-05", 600, 660),  # conflict, loads a third month
+        ("dvorana", "2027-01-06", 600, 660),  # touches January again
+    ])
+    assert added == [True, False, False, True]
+
+    reopened = PartitionedStorage(root, tmp_path / "inquiries.jsonl", legacy_calendar_path=None)
+    assert len(reopened.day("dvorana", "2027-01-05")) == 1
+    assert len(reopened.day("dvorana", "2027-01-06")) == 1